@@ -0,0 +1,332 @@
+"""
+Scores many positions at once with NumPy.
+
+Positions are stacked into an N x 64 array of piece codes, and material, piece-square tables, mobility
+and pawn structure are computed for the whole batch with array operations instead of one GameEngine at a time.
+The weights are a JSON file, so the scorer can be retuned without changing code. With mobility and pawn
+structure weighted 0, a score equals GameEngine.get_evaluation() for the same position.
+
+NumPy is only needed for this module.
+
+Usage:
+    python batch_evaluation.py --fen-file positions.txt
+    python batch_evaluation.py --fen-file positions.txt --weights weights.json
+    python batch_evaluation.py --save-weights weights.json
+    python batch_evaluation.py --check
+"""
+import argparse
+import json
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from constants import *
+from evaluation import (ENDGAME_TABLES, ENDGAME_VALUES, MAX_PHASE, MIDGAME_TABLES, MIDGAME_VALUES,
+                        PHASE_WEIGHTS)
+from fen import PIECE_LETTERS
+from lookup_tables import KNIGHT_TARGETS, KING_TARGETS, QUEEN_RAYS
+
+NUM_PIECE_CODES = 13  # Blank, then the six white piece types, then the six black ones
+CHUNK_SIZE = 4096  # Positions scored per pass, bounds the memory used by the mobility arrays
+
+DEFAULT_WEIGHTS = {
+    'midgame_values': MIDGAME_VALUES,
+    'endgame_values': ENDGAME_VALUES,
+    'midgame_tables': MIDGAME_TABLES,
+    'endgame_tables': ENDGAME_TABLES,
+    'phase_weights': PHASE_WEIGHTS,
+    'mobility': [0, 0, 4, 3, 2, 1, 0],  # Per square a piece can move to, by piece type
+    'doubled_pawn': -10,  # Per pawn beyond the first on a file
+    'isolated_pawn': -15,  # Per pawn with no friendly pawn on an adjacent file
+    'passed_pawn': [0, 5, 10, 20, 35, 60, 100, 0],  # By ranks advanced from the starting rank side
+}
+
+# (FEN, pawn structure score with DEFAULT_WEIGHTS) of hand-built positions, checked by --check
+PAWN_STRUCTURE_CHECKS = [
+    ('4k3/8/8/4P3/8/8/8/4K3 w - - 0 1', 35 - 15),  # Lone isolated passer on e5
+    ('4k3/3p4/8/4P3/8/8/8/4K3 w - - 0 1', 0),  # d7 guards e6, neither pawn is passed
+    ('4k3/8/4p3/4P3/8/8/8/4K3 w - - 0 1', 0),  # Blocked on the same file
+    ('4k3/8/8/4P3/3p4/8/8/4K3 w - - 0 1', 0),  # Pawns that have passed each other are both passed
+    ('4k3/8/8/3PP3/8/8/8/4K3 w - - 0 1', 35 + 35),  # Connected passers
+    ('4k3/p7/8/4P3/8/8/8/4K3 w - - 0 1', 35 - 15 - (5 - 15)),  # A black passer on its starting rank
+    ('4k3/8/8/8/8/p7/7P/4K3 w - - 0 1', 5 - 15 - (60 - 15)),
+    ('4k3/8/8/8/2P5/2P5/8/4K3 w - - 0 1', 20 + 10 - 10 - 2 * 15),  # Doubled, both passed
+    ('4k3/pp6/8/8/8/8/PP6/4K3 w - - 0 1', 0),
+]
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError('batch evaluation needs NumPy, install it with "pip install numpy"')
+
+
+def get_piece_code(piece):
+    """0 for a blank square, the piece type for white pieces and the piece type + 6 for black pieces."""
+    if piece.TYPE == BLANK:
+        return 0
+    return piece.TYPE if piece.COLOR == WHITE else piece.TYPE + 6
+
+
+def load_weights(path):
+    """
+    Reads weights from a JSON file. Keys that are missing keep their DEFAULT_WEIGHTS value.
+    """
+    with open(path) as weights_file:
+        weights = json.load(weights_file)
+    unknown_keys = set(weights) - set(DEFAULT_WEIGHTS)
+    if unknown_keys:
+        raise ValueError(f'unknown weights in {path}: {", ".join(sorted(unknown_keys))}')
+    return {**DEFAULT_WEIGHTS, **weights}
+
+
+def save_weights(weights, path):
+    with open(path, 'w') as weights_file:
+        json.dump(weights, weights_file, indent=1)
+
+
+def encode_fen_placement(placement, codes):
+    """Writes the piece codes of the placement field of a FEN string into codes, a row of 64."""
+    square = 0
+    for character in placement:
+        if character == '/':
+            continue
+        if character.isdigit():
+            square += int(character)
+        else:
+            piece_type = PIECE_LETTERS.index(character.lower())
+            codes[square] = piece_type if character.isupper() else piece_type + 6
+            square += 1
+
+
+def encode_positions(positions):
+    """
+    Stacks positions, each a GameEngine or a FEN string, into arrays.
+
+    :return: (codes, white_to_move) where codes is an N x 64 uint8 array of piece codes by square
+             (row * 8 + column) and white_to_move an N bool array.
+    """
+    require_numpy()
+    codes = np.zeros((len(positions), 64), dtype=np.uint8)
+    white_to_move = np.zeros(len(positions), dtype=bool)
+    for index, position in enumerate(positions):
+        if isinstance(position, str):
+            fields = position.split()
+            encode_fen_placement(fields[0], codes[index])
+            white_to_move[index] = len(fields) < 2 or fields[1] == 'w'
+        else:
+            codes[index] = [get_piece_code(piece) for row in position.board for piece in row]
+            white_to_move[index] = position.color_to_move == WHITE
+    return codes, white_to_move
+
+
+def to_planes(codes):
+    """
+    One-hot N x 12 x 64 bool planes, one per piece code except blank, for callers that want them.
+    """
+    require_numpy()
+    return codes[:, np.newaxis, :] == np.arange(1, NUM_PIECE_CODES, dtype=np.uint8)[np.newaxis, :, np.newaxis]
+
+
+def build_square_tables(values, tables):
+    """NUM_PIECE_CODES x 64 value plus square bonus of each piece code, positive for white, negative for black."""
+    square_tables = np.zeros((NUM_PIECE_CODES, 64), dtype=np.int64)
+    for piece_type in PIECE_TYPES[1:]:
+        table = np.array(tables[piece_type], dtype=np.int64)
+        square_tables[piece_type] = values[piece_type] + table.reshape(64)
+        square_tables[piece_type + 6] = -(values[piece_type] + table[::-1].reshape(64))  # Mirrored for black
+    return square_tables
+
+
+def build_step_targets(targets_table):
+    """64 x 8 squares reachable in one step from each square, padded with the off-board square 64."""
+    targets = np.full((64, 8), 64, dtype=np.int64)
+    for row in range(8):
+        for column in range(8):
+            for index, (end_row, end_column) in enumerate(targets_table[row][column]):
+                targets[row * 8 + column, index] = end_row * 8 + end_column
+    return targets
+
+
+def build_rays():
+    """64 x 8 x 7 squares along each direction from each square, nearest first, padded with square 64."""
+    rays = np.full((64, 8, 7), 64, dtype=np.int64)
+    for row in range(8):
+        for column in range(8):
+            for direction, ray in enumerate(QUEEN_RAYS[row][column]):
+                for index, (end_row, end_column) in enumerate(ray):
+                    rays[row * 8 + column, direction, index] = end_row * 8 + end_column
+    return rays
+
+
+class BatchEvaluator:
+    """
+    Scores batches of positions with one set of weights. The weights are turned into arrays once.
+    """
+
+    def __init__(self, weights=None):
+        require_numpy()
+        weights = DEFAULT_WEIGHTS if weights is None else weights
+        self.midgame_tables = build_square_tables(weights['midgame_values'], weights['midgame_tables'])
+        self.endgame_tables = build_square_tables(weights['endgame_values'], weights['endgame_tables'])
+        self.phase_weights = np.array(weights['phase_weights'] + weights['phase_weights'][1:], dtype=np.int64)
+        self.mobility_weights = np.array(weights['mobility'], dtype=np.int64)
+        self.doubled_pawn_weight = weights['doubled_pawn']
+        self.isolated_pawn_weight = weights['isolated_pawn']
+        self.passed_pawn_weights = np.array(weights['passed_pawn'], dtype=np.int64)
+
+        self.knight_targets = build_step_targets(KNIGHT_TARGETS)
+        self.king_targets = build_step_targets(KING_TARGETS)
+        self.rays = build_rays()
+        self.slider_directions = {BISHOP: slice(4, 8), ROOK: slice(0, 4), QUEEN: slice(0, 8)}  # Into QUEEN_RAYS
+
+    def evaluate(self, positions):
+        """
+        Scores a list of GameEngine objects or FEN strings.
+        :return: int64 array of scores in centipawns from the point of view of each side to move.
+        """
+        return self.evaluate_codes(*encode_positions(positions))
+
+    def evaluate_codes(self, codes, white_to_move):
+        """Scores encoded positions, see encode_positions(), in chunks of CHUNK_SIZE."""
+        scores = np.empty(len(codes), dtype=np.int64)
+        for start in range(0, len(codes), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            scores[chunk] = self.evaluate_chunk(codes[chunk].astype(np.int64), white_to_move[chunk])
+        return scores
+
+    def evaluate_chunk(self, codes, white_to_move):
+        squares = np.arange(64)
+        midgame_scores = self.midgame_tables[codes, squares].sum(axis=1)
+        endgame_scores = self.endgame_tables[codes, squares].sum(axis=1)
+        phases = np.minimum(self.phase_weights[codes].sum(axis=1), MAX_PHASE)
+        scores = (midgame_scores * phases + endgame_scores * (MAX_PHASE - phases)) // MAX_PHASE
+
+        scores += self.get_mobility_scores(codes) + self.get_pawn_structure_scores(codes)
+        return np.where(white_to_move, scores, -scores)
+
+    def get_mobility_scores(self, codes):
+        """
+        Weighted count of the squares each piece can move to, ignoring pins and checks.
+        A slider moves along each ray up to the first piece, which it can capture if it is an enemy.
+        """
+        num_positions = len(codes)
+        padded_codes = np.concatenate([codes, np.full((num_positions, 1), 255)], axis=1)  # Square 64 is off board
+        colors = np.zeros(padded_codes.shape, dtype=np.int8)  # 1 white, -1 black, 0 blank or off board
+        colors[(padded_codes >= 1) & (padded_codes <= 6)] = 1
+        colors[(padded_codes >= 7) & (padded_codes <= 12)] = -1
+        piece_colors = colors[:, :64]
+        piece_types = np.where(codes > 6, codes - 6, codes)
+        signs = piece_colors.astype(np.int64)
+
+        scores = np.zeros(num_positions, dtype=np.int64)
+        for piece_type, targets in ((KNIGHT, self.knight_targets), (KING, self.king_targets)):
+            target_colors = colors[:, targets]  # N x 64 x 8
+            reachable = (targets != 64) & (target_colors != piece_colors[:, :, np.newaxis])
+            counts = reachable.sum(axis=2)
+            scores += self.mobility_weights[piece_type] * (counts * signs * (piece_types == piece_type)).sum(axis=1)
+
+        ray_colors = colors[:, self.rays]  # N x 64 x 8 x 7
+        on_board = self.rays != 64
+        empty = (ray_colors == 0) & on_board
+        num_empty = np.cumprod(empty, axis=3).sum(axis=3)  # Empty squares before the first piece, N x 64 x 8
+        first_piece_index = np.minimum(num_empty, 6)[..., np.newaxis]
+        first_piece_colors = np.take_along_axis(ray_colors, first_piece_index, axis=3)[..., 0]
+        first_piece_on_board = np.take_along_axis(on_board[np.newaxis], first_piece_index, axis=3)[..., 0]
+        captures = first_piece_on_board & (first_piece_colors == -piece_colors[:, :, np.newaxis])
+        ray_counts = num_empty + captures
+        for piece_type, directions in self.slider_directions.items():
+            counts = ray_counts[:, :, directions].sum(axis=2)
+            scores += self.mobility_weights[piece_type] * (counts * signs * (piece_types == piece_type)).sum(axis=1)
+        return scores
+
+    def get_pawn_structure_scores(self, codes):
+        """Doubled, isolated and passed pawns, white minus black."""
+        rows = np.arange(8)[np.newaxis, :, np.newaxis]
+        boards = codes.reshape(-1, 8, 8)
+        white_pawns = boards == PAWN
+        black_pawns = boards == PAWN + 6
+        scores = np.zeros(len(codes), dtype=np.int64)
+
+        for pawns, sign in ((white_pawns, 1), (black_pawns, -1)):
+            pawns_per_file = pawns.sum(axis=1)  # N x 8
+            doubled = np.maximum(pawns_per_file - 1, 0).sum(axis=1)
+            has_pawns = pawns_per_file > 0
+            has_neighbours = np.zeros_like(has_pawns)
+            has_neighbours[:, 1:] |= has_pawns[:, :-1]
+            has_neighbours[:, :-1] |= has_pawns[:, 1:]
+            isolated = (pawns_per_file * ~has_neighbours).sum(axis=1)
+            scores += sign * (self.doubled_pawn_weight * doubled + self.isolated_pawn_weight * isolated)
+
+        # A white pawn is passed if no black pawn is ahead of it, towards row 0, on its own or an adjacent file,
+        # so if it is no further up the board than the least advanced black pawn there. Mirrored for black.
+        least_advanced_black = np.where(black_pawns, rows, 8).min(axis=1)  # N x 8, 8 if the file has none
+        least_advanced_white = np.where(white_pawns, rows, -1).max(axis=1)  # -1 if the file has none
+        black_rear = self.spread_to_adjacent_files(least_advanced_black, np.minimum, 8)
+        white_rear = self.spread_to_adjacent_files(least_advanced_white, np.maximum, -1)
+        white_passed = white_pawns & (rows <= black_rear[:, np.newaxis, :])
+        black_passed = black_pawns & (rows >= white_rear[:, np.newaxis, :])
+        white_ranks_advanced = np.broadcast_to(7 - rows, boards.shape)
+        black_ranks_advanced = np.broadcast_to(rows, boards.shape)
+        scores += (self.passed_pawn_weights[white_ranks_advanced] * white_passed).sum(axis=(1, 2))
+        scores -= (self.passed_pawn_weights[black_ranks_advanced] * black_passed).sum(axis=(1, 2))
+        return scores
+
+    @staticmethod
+    def spread_to_adjacent_files(values, combine, missing):
+        """Combines each file's value with those of its neighbouring files, N x 8."""
+        left = np.concatenate([np.full((len(values), 1), missing), values[:, :-1]], axis=1)
+        right = np.concatenate([values[:, 1:], np.full((len(values), 1), missing)], axis=1)
+        return combine(combine(left, values), right)
+
+
+def check_pawn_structure():
+    """:return: (FEN, expected score, score) of each of PAWN_STRUCTURE_CHECKS that the default weights get wrong."""
+    codes, _ = encode_positions([fen for fen, _ in PAWN_STRUCTURE_CHECKS])
+    scores = BatchEvaluator().get_pawn_structure_scores(codes.astype(np.int64))
+    return [(fen, expected, score) for (fen, expected), score in zip(PAWN_STRUCTURE_CHECKS, scores)
+            if score != expected]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a file of positions, one FEN per line, with NumPy.')
+    parser.add_argument('--fen-file', help='positions to score')
+    parser.add_argument('--weights', help='JSON weights file, defaults to the built-in weights')
+    parser.add_argument('--save-weights', help='write the weights in use to this JSON file, to edit and load')
+    parser.add_argument('--check', action='store_true',
+                        help='check the pawn structure scores of hand-built positions')
+    args = parser.parse_args(argv)
+    require_numpy()
+
+    if args.check:
+        failures = check_pawn_structure()
+        for fen, expected, score in failures:
+            print(f'{fen}: pawn structure {score}, expected {expected}')
+        print(f'{len(PAWN_STRUCTURE_CHECKS) - len(failures)}/{len(PAWN_STRUCTURE_CHECKS)} pawn structure checks passed')
+        return 1 if failures else 0
+
+    weights = load_weights(args.weights) if args.weights else DEFAULT_WEIGHTS
+    if args.save_weights:
+        save_weights(weights, args.save_weights)
+    if not args.fen_file:
+        return 0
+
+    with open(args.fen_file) as fen_file:
+        fens = [line.strip() for line in fen_file if line.strip()]
+    evaluator = BatchEvaluator(weights)
+    start_time = time.perf_counter()
+    scores = evaluator.evaluate(fens)
+    elapsed = time.perf_counter() - start_time
+
+    for fen, score in zip(fens, scores):
+        print(f'{score}\t{fen}')
+    positions_per_second = int(len(fens) / elapsed) if elapsed > 0 else 0
+    print(f'\n{len(fens)} positions in {elapsed:.3f}s ({positions_per_second} positions/s)', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
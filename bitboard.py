@@ -0,0 +1,373 @@
+"""
+Bitboard representation of a position.
+
+Each piece type of each color is a 64 bit Python int with bit (row * 8 + column) set for every square it
+occupies, so square 0 is a8 and square 63 is h1, matching the row/column layout of GameEngine.board.
+Attack sets are the lookup_tables squares turned into bitboards once at import, and sliding attacks
+are found by cutting a precomputed ray off at its first blocker.
+
+Moves are ints: from square | to square << 6 | promotion piece type << 12 | flag << 15.
+"""
+from constants import *
+from lookup_tables import *
+from move import Move
+
+NORMAL_MOVE, EN_PASSANT_MOVE, CASTLE_MOVE, DOUBLE_PAWN_PUSH = range(4)
+
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+
+
+def square_bit(row, column):
+    return 1 << (row * 8 + column)
+
+
+def lowest_square(bitboard):
+    return (bitboard & -bitboard).bit_length() - 1
+
+
+def iterate_squares(bitboard):
+    while bitboard:
+        lowest_bit = bitboard & -bitboard
+        yield lowest_bit.bit_length() - 1
+        bitboard ^= lowest_bit
+
+
+def to_bitboard(squares):
+    bitboard = 0
+    for row, column in squares:
+        bitboard |= square_bit(row, column)
+    return bitboard
+
+
+def _build_step_attacks(step_table):
+    return [to_bitboard(step_table[row][column]) for row in range(8) for column in range(8)]
+
+
+def _build_rays(ray_table, directions):
+    """(ray bitboards by square, whether the ray runs towards higher squares) for each direction."""
+    return [([to_bitboard(ray_table[row][column][index]) for row in range(8) for column in range(8)],
+             direction[0] * 8 + direction[1] > 0)
+            for index, direction in enumerate(directions)]
+
+
+def _build_between_and_line():
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for row in range(8):
+        for column in range(8):
+            square = row * 8 + column
+            rays = QUEEN_RAYS[row][column]
+            for direction, ray in zip(ALL_DIRECTIONS, rays):
+                opposite_ray = rays[ALL_DIRECTIONS.index((-direction[0], -direction[1]))]
+                full_line = (1 << square) | to_bitboard(ray) | to_bitboard(opposite_ray)
+                squares_between = 0
+                for end_row, end_column in ray:
+                    end_square = end_row * 8 + end_column
+                    between[square][end_square] = squares_between
+                    line[square][end_square] = full_line
+                    squares_between |= 1 << end_square
+    return between, line
+
+
+KNIGHT_ATTACKS = _build_step_attacks(KNIGHT_TARGETS)
+KING_ATTACKS = _build_step_attacks(KING_TARGETS)
+PAWN_ATTACKS = [_build_step_attacks(PAWN_CAPTURES[BLACK]), _build_step_attacks(PAWN_CAPTURES[WHITE])]
+ROOK_RAYS = _build_rays(CARDINAL_RAYS, CARDINAL_DIRECTIONS)
+BISHOP_RAYS = _build_rays(DIAGONAL_RAYS, DIAGONAL_DIRECTIONS)
+BETWEEN, LINE = _build_between_and_line()
+
+# Castling rights that survive a move from or to each square
+CASTLING_RIGHTS_KEPT = [15] * 64
+CASTLING_RIGHTS_KEPT[60] = 15 & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_RIGHTS_KEPT[63] = 15 & ~WHITE_KINGSIDE
+CASTLING_RIGHTS_KEPT[56] = 15 & ~WHITE_QUEENSIDE
+CASTLING_RIGHTS_KEPT[4] = 15 & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_RIGHTS_KEPT[7] = 15 & ~BLACK_KINGSIDE
+CASTLING_RIGHTS_KEPT[0] = 15 & ~BLACK_QUEENSIDE
+
+PROMOTION_TYPES = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+
+def slide(square, occupancy, rays):
+    attacks = 0
+    for ray_table, towards_higher_squares in rays:
+        ray = ray_table[square]
+        blockers = ray & occupancy
+        if blockers:
+            if towards_higher_squares:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= ray_table[blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(square, occupancy):
+    return slide(square, occupancy, ROOK_RAYS)
+
+
+def bishop_attacks(square, occupancy):
+    return slide(square, occupancy, BISHOP_RAYS)
+
+
+ROOK_EMPTY_BOARD_ATTACKS = [rook_attacks(square, 0) for square in range(64)]
+BISHOP_EMPTY_BOARD_ATTACKS = [bishop_attacks(square, 0) for square in range(64)]
+
+
+def encode_move(from_square, to_square, promotion=0, flag=NORMAL_MOVE):
+    return from_square | to_square << 6 | promotion << 12 | flag << 15
+
+
+def piece_code(color, piece_type):
+    """Pieces in BitboardPosition.squares are stored as piece type + 8 for white, 0 is a blank square."""
+    return piece_type | (8 if color else 0)
+
+
+class BitboardPosition:
+    """
+    A position stored as 12 piece bitboards plus per color occupancy.
+
+    squares mirrors the bitboards as one piece code per square, so captures are found without
+    searching every bitboard.
+    """
+
+    def __init__(self):
+        self.pieces = [[0] * 7, [0] * 7]  # [color][piece type]
+        self.occupancy = [0, 0]  # [color]
+        self.squares = [0] * 64
+        self.color_to_move = WHITE
+        self.castling_rights = 0
+        self.en_passant_square = -1  # Square the side to move can capture en passant on
+        self.history = []
+
+    @classmethod
+    def from_engine(cls, engine):
+        position = cls()
+        for row in engine.board:
+            for piece in row:
+                if piece.TYPE != BLANK:
+                    position.put_piece(piece.row * 8 + piece.column, piece_code(piece.COLOR, piece.TYPE))
+
+        position.color_to_move = engine.color_to_move
+        position.castling_rights = ((WHITE_KINGSIDE if engine.white_castling_rights.can_castle_kingside else 0)
+                                    | (WHITE_QUEENSIDE if engine.white_castling_rights.can_castle_queenside else 0)
+                                    | (BLACK_KINGSIDE if engine.black_castling_rights.can_castle_kingside else 0)
+                                    | (BLACK_QUEENSIDE if engine.black_castling_rights.can_castle_queenside else 0))
+        if engine.color_to_move == WHITE and engine.en_passant_possible_white:
+            position.en_passant_square = engine.en_passant_move_white[0] * 8 + engine.en_passant_move_white[1]
+        elif engine.color_to_move == BLACK and engine.en_passant_possible_black:
+            position.en_passant_square = engine.en_passant_move_black[0] * 8 + engine.en_passant_move_black[1]
+        return position
+
+    def put_piece(self, square, code):
+        bit = 1 << square
+        color = code >> 3
+        self.pieces[color][code & 7] |= bit
+        self.occupancy[color] |= bit
+        self.squares[square] = code
+
+    def remove_piece(self, square):
+        code = self.squares[square]
+        bit = 1 << square
+        color = code >> 3
+        self.pieces[color][code & 7] ^= bit
+        self.occupancy[color] ^= bit
+        self.squares[square] = 0
+        return code
+
+    def attackers_to(self, square, color, occupancy):
+        """Pieces of color attacking square, with only the pieces in occupancy on the board."""
+        pieces = self.pieces[color]
+        return ((KNIGHT_ATTACKS[square] & pieces[KNIGHT])
+                | (PAWN_ATTACKS[not color][square] & pieces[PAWN])
+                | (KING_ATTACKS[square] & pieces[KING])
+                | (rook_attacks(square, occupancy) & (pieces[ROOK] | pieces[QUEEN]))
+                | (bishop_attacks(square, occupancy) & (pieces[BISHOP] | pieces[QUEEN]))) & occupancy
+
+    def is_in_check(self, color):
+        king_square = lowest_square(self.pieces[color][KING])
+        return bool(self.attackers_to(king_square, not color, self.occupancy[WHITE] | self.occupancy[BLACK]))
+
+    def get_pinned_pieces(self, king_square, color, occupancy):
+        enemy_pieces = self.pieces[not color]
+        snipers = ((ROOK_EMPTY_BOARD_ATTACKS[king_square] & (enemy_pieces[ROOK] | enemy_pieces[QUEEN]))
+                   | (BISHOP_EMPTY_BOARD_ATTACKS[king_square] & (enemy_pieces[BISHOP] | enemy_pieces[QUEEN])))
+        pinned = 0
+        for sniper_square in iterate_squares(snipers):
+            blockers = BETWEEN[king_square][sniper_square] & occupancy
+            if blockers and not blockers & (blockers - 1) and blockers & self.occupancy[color]:
+                pinned |= blockers
+        return pinned
+
+    def generate_legal_moves(self, color):
+        """
+        Legal moves of color, which should be the side to move, as encoded ints.
+        """
+        own = self.occupancy[color]
+        occupancy = own | self.occupancy[not color]
+        pieces = self.pieces[color]
+        king_square = lowest_square(pieces[KING])
+        checkers = self.attackers_to(king_square, not color, occupancy)
+        moves = []
+
+        occupancy_without_king = occupancy ^ (1 << king_square)
+        for to_square in iterate_squares(KING_ATTACKS[king_square] & ~own):
+            if not self.attackers_to(to_square, not color, occupancy_without_king):
+                moves.append(king_square | to_square << 6)
+
+        if checkers & (checkers - 1):  # Double check, only the king can move
+            return moves
+        if checkers:
+            target_mask = (checkers | BETWEEN[king_square][lowest_square(checkers)]) & ~own
+        else:
+            target_mask = ~own
+            self.add_castling_moves(moves, color, king_square, occupancy)
+
+        pinned = self.get_pinned_pieces(king_square, color, occupancy)
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN):
+            for from_square in iterate_squares(pieces[piece_type]):
+                if piece_type == KNIGHT:
+                    if (1 << from_square) & pinned:  # A pinned knight can never move
+                        continue
+                    targets = KNIGHT_ATTACKS[from_square]
+                elif piece_type == BISHOP:
+                    targets = bishop_attacks(from_square, occupancy)
+                elif piece_type == ROOK:
+                    targets = rook_attacks(from_square, occupancy)
+                else:
+                    targets = rook_attacks(from_square, occupancy) | bishop_attacks(from_square, occupancy)
+                targets &= target_mask
+                if (1 << from_square) & pinned:
+                    targets &= LINE[king_square][from_square]
+                for to_square in iterate_squares(targets):
+                    moves.append(from_square | to_square << 6)
+
+        self.add_pawn_moves(moves, color, king_square, occupancy, target_mask, pinned)
+        return moves
+
+    def add_pawn_moves(self, moves, color, king_square, occupancy, target_mask, pinned):
+        enemy = self.occupancy[not color]
+        forward = -8 if color == WHITE else 8
+        start_row, promotion_row = (6, 0) if color == WHITE else (1, 7)
+        for from_square in iterate_squares(self.pieces[color][PAWN]):
+            targets = PAWN_ATTACKS[color][from_square] & enemy
+            one_step = from_square + forward
+            if not (occupancy >> one_step) & 1:
+                targets |= 1 << one_step
+                two_steps = one_step + forward
+                if from_square >> 3 == start_row and not (occupancy >> two_steps) & 1 and (target_mask >> two_steps) & 1:
+                    if not (1 << from_square) & pinned or (LINE[king_square][from_square] >> two_steps) & 1:
+                        moves.append(encode_move(from_square, two_steps, flag=DOUBLE_PAWN_PUSH))
+            targets &= target_mask
+            if (1 << from_square) & pinned:
+                targets &= LINE[king_square][from_square]
+            for to_square in iterate_squares(targets):
+                if to_square >> 3 == promotion_row:
+                    for promotion in PROMOTION_TYPES:
+                        moves.append(encode_move(from_square, to_square, promotion))
+                else:
+                    moves.append(from_square | to_square << 6)
+
+            if self.en_passant_square >= 0 and (PAWN_ATTACKS[color][from_square] >> self.en_passant_square) & 1:
+                if self.is_legal_en_passant(color, from_square, king_square, occupancy):
+                    moves.append(encode_move(from_square, self.en_passant_square, flag=EN_PASSANT_MOVE))
+
+    def is_legal_en_passant(self, color, from_square, king_square, occupancy):
+        """Both pawns leave their squares at once, so check the king against the resulting occupancy."""
+        captured_square = self.en_passant_square + (8 if color == WHITE else -8)
+        occupancy_after = occupancy ^ (1 << from_square) ^ (1 << captured_square) | (1 << self.en_passant_square)
+        return not self.attackers_to(king_square, not color, occupancy_after)
+
+    def add_castling_moves(self, moves, color, king_square, occupancy):
+        if color == WHITE:
+            kingside, queenside, home_square = WHITE_KINGSIDE, WHITE_QUEENSIDE, 60
+        else:
+            kingside, queenside, home_square = BLACK_KINGSIDE, BLACK_QUEENSIDE, 4
+        if king_square != home_square:
+            return
+        rooks = self.pieces[color][ROOK]
+        if (self.castling_rights & kingside and (rooks >> (home_square + 3)) & 1
+                and not occupancy & (3 << (home_square + 1))
+                and not self.attackers_to(home_square + 1, not color, occupancy)
+                and not self.attackers_to(home_square + 2, not color, occupancy)):
+            moves.append(encode_move(home_square, home_square + 2, flag=CASTLE_MOVE))
+        if (self.castling_rights & queenside and (rooks >> (home_square - 4)) & 1
+                and not occupancy & (7 << (home_square - 3))
+                and not self.attackers_to(home_square - 1, not color, occupancy)
+                and not self.attackers_to(home_square - 2, not color, occupancy)):
+            moves.append(encode_move(home_square, home_square - 2, flag=CASTLE_MOVE))
+
+    def make_move(self, move):
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flag = move >> 15
+
+        code = self.remove_piece(from_square)
+        captured_code = self.squares[to_square]
+        if captured_code:
+            self.remove_piece(to_square)
+        self.history.append((move, captured_code, self.castling_rights, self.en_passant_square))
+
+        self.put_piece(to_square, (code & 8) | promotion if promotion else code)
+        if flag == EN_PASSANT_MOVE:
+            self.remove_piece(to_square + (8 if code & 8 else -8))
+        elif flag == CASTLE_MOVE:
+            if to_square > from_square:  # Kingside
+                self.put_piece(to_square - 1, self.remove_piece(to_square + 1))
+            else:
+                self.put_piece(to_square + 1, self.remove_piece(to_square - 2))
+
+        self.castling_rights &= CASTLING_RIGHTS_KEPT[from_square] & CASTLING_RIGHTS_KEPT[to_square]
+        self.en_passant_square = (from_square + to_square) // 2 if flag == DOUBLE_PAWN_PUSH else -1
+        self.color_to_move = not (code & 8)
+
+    def unmake_move(self):
+        move, captured_code, self.castling_rights, self.en_passant_square = self.history.pop()
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flag = move >> 15
+
+        code = self.remove_piece(to_square)
+        if promotion:
+            code = (code & 8) | PAWN
+        self.put_piece(from_square, code)
+        if captured_code:
+            self.put_piece(to_square, captured_code)
+        if flag == EN_PASSANT_MOVE:
+            self.put_piece(to_square + (8 if code & 8 else -8), (~code & 8) | PAWN)
+        elif flag == CASTLE_MOVE:
+            if to_square > from_square:
+                self.put_piece(to_square + 1, self.remove_piece(to_square - 1))
+            else:
+                self.put_piece(to_square - 2, self.remove_piece(to_square + 1))
+        self.color_to_move = bool(code & 8)
+
+    def encode(self, move):
+        """
+        The int for a Move played in this position.
+        """
+        from_square = move.start_row * 8 + move.start_column
+        to_square = move.end_row * 8 + move.end_column
+        piece_type = self.squares[from_square] & 7
+        flag = NORMAL_MOVE
+        if piece_type == KING and abs(to_square - from_square) == 2:
+            flag = CASTLE_MOVE
+        elif piece_type == PAWN and to_square == self.en_passant_square:
+            flag = EN_PASSANT_MOVE
+        elif piece_type == PAWN and abs(to_square - from_square) == 16:
+            flag = DOUBLE_PAWN_PUSH
+
+        promotion = 0
+        if piece_type == PAWN and move.end_row in (0, 7):
+            promotion = move.promotion or QUEEN
+        return encode_move(from_square, to_square, promotion, flag)
+
+    @staticmethod
+    def to_move(move):
+        from_row, from_column = divmod(move & 63, 8)
+        to_row, to_column = divmod((move >> 6) & 63, 8)
+        promotion = (move >> 12) & 7
+        return Move(from_row, from_column, to_row, to_column, promotion or None)
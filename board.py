@@ -1,4 +1,3 @@
-import pygame
 from pieces import *
 from constants import *
 
@@ -10,17 +9,17 @@ class Board:
         self.board = [
             [Rook(BLACK), Knight(BLACK), Bishop(BLACK), Queen(BLACK), King(BLACK), Bishop(BLACK), Knight(BLACK), Rook(BLACK)],
             [Pawn(BLACK), Pawn(BLACK), Pawn(BLACK), Pawn(BLACK), Pawn(BLACK), Pawn(BLACK), Pawn(BLACK), Pawn(BLACK)],
-            [Blank(), Blank(), Blank(), Blank(), Blank(), Blank(), Blank(), Blank()],
-            [Blank(), Blank(), Blank(), Blank(), Blank(), Blank(), Blank(), Blank()],
-            [Blank(), Blank(), Blank(), Blank(), Blank(), Blank(), Blank(), Blank()],
-            [Blank(), Blank(), Blank(), Blank(), Blank(), Blank(), Blank(), Blank()],
+            [get_blank(2, column) for column in range(8)],
+            [get_blank(3, column) for column in range(8)],
+            [get_blank(4, column) for column in range(8)],
+            [get_blank(5, column) for column in range(8)],
             [Pawn(WHITE), Pawn(WHITE), Pawn(WHITE), Pawn(WHITE), Pawn(WHITE), Pawn(WHITE), Pawn(WHITE), Pawn(WHITE)],
             [Rook(WHITE), Knight(WHITE), Bishop(WHITE), Queen(WHITE), King(WHITE), Bishop(WHITE), Knight(WHITE), Rook(WHITE)]
             ]
-        for row in self.board:
-            for piece in row:
-                piece.row = self.board.index(row)
-                piece.column = row.index(piece)
+        for row, board_row in enumerate(self.board):
+            for column, piece in enumerate(board_row):
+                piece.row = row
+                piece.column = column
 
 
 class DebugBoard:
@@ -0,0 +1,98 @@
+import threading
+
+from eventmanager import *
+from fen import to_fen
+from model import GameEngine
+from search import Searcher
+from transposition_table import TranspositionTable
+
+DEFAULT_TIME_BUDGET = 2.0  # Seconds per move
+TABLE_MB = 16
+
+
+class ComputerPlayer:
+    """
+    Plays one color. Searches on a background thread, so the game loop keeps drawing and handling input
+    while the computer thinks, and posts an EngineMoveEvent with the move it chose.
+
+    The search starts as soon as the position changes to the computer's turn, on the InitializeEvent or
+    the InputEvent posted after each move and undo, since a tick may block waiting for input before
+    on_tick runs.
+    """
+
+    def __init__(self, event_manager, model, color, time_budget=DEFAULT_TIME_BUDGET, max_depth=None):
+        """
+        :param event_manager: Allows posting messages to the event queue.
+        :param model: a strong reference to the game Model. Only read on the main thread.
+        :param color: the color the computer plays.
+        :param time_budget: seconds to think per move.
+        :param max_depth: deepest iteration to search, None for no limit.
+        """
+        self.event_manager = event_manager
+        event_manager.subscribe(InitializeEvent, self.on_initialize)
+        event_manager.subscribe(TickEvent, self.on_tick)
+        event_manager.subscribe(EngineMoveEvent, self.on_engine_move)
+        event_manager.subscribe(InputEvent, self.on_input)
+        event_manager.subscribe(MoveNowEvent, self.on_move_now)
+        event_manager.subscribe(QuitEvent, self.on_quit)
+        self.model = model
+        self.color = color
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+
+        self.table = TranspositionTable(TABLE_MB)  # Only used by one search thread at a time
+        self.searcher = None
+        self.search_thread = None
+        self.searched_key = None  # Hash of the position of the last search, until its move is handled
+
+    def on_initialize(self, event):
+        self.start_search_if_to_move()
+
+    def on_tick(self, event):
+        self.start_search_if_to_move()
+
+    def on_engine_move(self, event):
+        if event.zobrist_key == self.searched_key:
+            self.searched_key = None
+
+    def on_input(self, event):
+        if self.is_searching() and self.model.zobrist_key != self.searched_key:
+            self.stop_search()  # A move was undone while thinking, the result is stale
+            self.search_thread.join()  # Quick, the search checks for a stop every few hundred nodes
+        self.start_search_if_to_move()
+
+    def on_move_now(self, event):
+        self.stop_search()
+
+    def on_quit(self, event):
+        self.stop_search()
+        if self.search_thread is not None:
+            self.search_thread.join()
+
+    def is_searching(self):
+        return self.search_thread is not None and self.search_thread.is_alive()
+
+    def start_search_if_to_move(self):
+        if (self.model.color_to_move != self.color or self.is_searching()
+                or self.searched_key == self.model.zobrist_key):
+            return
+        if not self.model.generate_legal_moves(self.color):
+            return  # Checkmate or stalemate
+
+        # Search a copy, so the thread never touches the board being drawn
+        engine = GameEngine.from_fen(to_fen(self.model), backend=self.model.backend)
+        self.searcher = Searcher(engine, self.table)
+        self.searched_key = self.model.zobrist_key
+        self.search_thread = threading.Thread(target=self.search, args=(self.searcher, self.searched_key),
+                                              daemon=True)
+        self.search_thread.start()
+
+    def search(self, searcher, zobrist_key):
+        """Runs on the search thread."""
+        result = searcher.search(self.max_depth, max_time=self.time_budget)
+        if result.best_move is not None:
+            self.event_manager.post_from_thread(EngineMoveEvent(result.best_move, zobrist_key))
+
+    def stop_search(self):
+        if self.searcher is not None:
+            self.searcher.stop()
@@ -4,4 +4,8 @@ COLOR_NAMES = ["black", "white"]
 
 PieceType = int
 PIECE_TYPES = [BLANK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING] = range(7)
-PIECE_NAMES = [None, "pawn", "knight", "bishop", "rook", "queen", "king"]
\ No newline at end of file
+PIECE_NAMES = [None, "pawn", "knight", "bishop", "rook", "queen", "king"]
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0]  # In centipawns, by piece type
+INFINITY = 1000000  # Beyond any score
+
+BACKENDS = [OBJECT_BACKEND, BITBOARD_BACKEND] = ["objects", "bitboard"]
@@ -1,9 +1,11 @@
 import pygame
-from copy import deepcopy
 import model
 from eventmanager import *
 from constants import *
 from board import DebugBoard
+from move import Move
+
+WAKE_UP_EVENT = pygame.USEREVENT  # Ends a blocking wait when another thread posts an event
 
 WIDTH = HEIGHT = 800
 DIMENSION = 8
@@ -15,37 +17,77 @@ class Keyboard:
     Handles Mouse input.
     """
 
-    def __init__(self, event_manager, model):
+    def __init__(self, event_manager, model, human_colors=(WHITE, BLACK)):
         """
         :param event_manager: Allows posting messages to the event queue.
         :param model: a strong reference to the game Model.
+        :param human_colors: the colors moved with the mouse, the others are played by a ComputerPlayer.
         """
         self.event_manager = event_manager
-        event_manager.register_listener(self)
+        event_manager.subscribe(TickEvent, self.on_tick)
+        event_manager.subscribe(EngineMoveEvent, self.on_engine_move)
         self.model = model
+        self.human_colors = human_colors
+        event_manager.wake_up = self.wake_up
 
-    def notify(self, event):
+    def on_tick(self, event):
         """
-        Receive events posted to the message queue.
+        Called for each game tick. We wait for keyboard presses here.
         """
 
-        if isinstance(event, TickEvent):
-            # Called for each game tick. We check out keyboard presses here.
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+        for input_event in self.wait_for_input(event.timeout):
+            if input_event.type == pygame.QUIT:
+                self.event_manager.post(QuitEvent())
+            # handle key down events
+            elif input_event.type == pygame.KEYDOWN:
+                if input_event.key == pygame.K_ESCAPE:
                     self.event_manager.post(QuitEvent())
-                # handle key down events
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.event_manager.post(QuitEvent())
-                    elif event.key == pygame.K_LEFT:
-                        if len(self.model.move_log) > 0:
-                            self.undo_move()
-                        self.event_manager.post(InputEvent(None))
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    pos = pygame.mouse.get_pos()
+                elif input_event.key == pygame.K_LEFT:
+                    if len(self.model.move_log) > 0:
+                        self.undo_move()
+                    self.event_manager.post(InputEvent(None))
+                elif input_event.key == pygame.K_SPACE:
+                    self.event_manager.post(MoveNowEvent())
+            elif input_event.type == pygame.MOUSEBUTTONDOWN:
+                pos = input_event.pos  # Where the click happened, the mouse may have moved since
+                if self.model.color_to_move in self.human_colors:
                     self.handle_mouse_click(pos)
-                    self.event_manager.post(InputEvent(pos))
+                self.event_manager.post(InputEvent(pos))
+
+    def on_engine_move(self, event):
+        if event.zobrist_key == self.model.zobrist_key:  # Else a move was undone while the computer thought
+            self.play_move(event.move)
+            self.event_manager.post(InputEvent(None))
+
+    @staticmethod
+    def wait_for_input(timeout):
+        """
+        Blocks until there is input or timeout seconds have passed, None to wait for input however long.
+        Returns every pending pygame event.
+        """
+        if timeout is None:
+            first_event = pygame.event.wait()
+        elif timeout > 0:
+            first_event = pygame.event.wait(max(1, int(timeout * 1000)))
+        else:
+            return pygame.event.get()
+        if first_event.type == pygame.NOEVENT:
+            return []
+        return [first_event] + pygame.event.get()
+
+    @staticmethod
+    def wake_up():
+        """Safe to call from any thread, pygame.event.post() is."""
+        if pygame.display.get_init():
+            pygame.event.post(pygame.event.Event(WAKE_UP_EVENT))
+
+    def play_move(self, move):
+        """
+        Plays a legal Move chosen by the computer, so it can be undone like any other.
+        Unlike mouse moves, which always promote to a queen, it keeps the promotion piece of move.
+        """
+        self.deselect_piece()
+        self.model.play_move(move)
 
     def handle_mouse_click(self, pos):
         column_index = pos[0] // SQUARE_SIZE
@@ -71,104 +113,15 @@ class Keyboard:
             legal_moves = self.model.get_legal_moves()
 
             if (clicked_piece.row, clicked_piece.column) in legal_moves:
-                self.append_move(clicked_piece)
-                self.model.update_castling_rights()
-                self.process_move(clicked_piece)
-                self.model.update_check_status()
-
-    def process_move(self, clicked_piece):
-        if clicked_piece.TYPE == BLANK:
-            # clicked_piece is a blank piece, the location of where to move
-            self.move(clicked_piece)
-        else:
-            # clicked_piece is a piece of the opposite color
-            self.capture(clicked_piece)
-        self.deselect_previous_piece(self.model.selected_piece)
+                self.model.play_move(Move(previous_selected_piece.row, previous_selected_piece.column,
+                                          clicked_piece.row, clicked_piece.column))
+                self.deselect_piece()
 
-    def move(self, clicked_piece):
-        previous_selected_piece = self.model.selected_piece
-        if previous_selected_piece is not None and previous_selected_piece.is_selected:
-            if self.model.is_en_passant_move(clicked_piece, previous_selected_piece):
-                self.model.capture_en_passant(clicked_piece, previous_selected_piece)
-            elif self.model.is_kingside_castle_move(clicked_piece, previous_selected_piece):
-                self.model.castle_kingside(clicked_piece, previous_selected_piece)
-            elif self.model.is_queenside_castle_move(clicked_piece, previous_selected_piece):
-                self.model.castle_queenside(clicked_piece, previous_selected_piece)
-            else:
-                self.model.swap(clicked_piece, previous_selected_piece)
-
-    def capture(self, clicked_piece):
-        previous_selected_piece = self.model.selected_piece
-        if previous_selected_piece is not None and previous_selected_piece.is_selected:
-            self.model.capture(clicked_piece, previous_selected_piece)
-
-    def deselect_previous_piece(self, previous_selected_piece):
-        previous_selected_piece.is_selected = False
-        self.model.selected_piece = None
-        self.model.color_to_move = not self.model.color_to_move
-
-    def append_move(self, clicked_piece):
-        selected_piece = self.model.selected_piece
-
-        selected_piece_copy = deepcopy(selected_piece)
-        clicked_piece_copy = deepcopy(clicked_piece)
-
-        for piece in (selected_piece_copy, clicked_piece_copy):
-            if piece is not None:
-                piece.is_selected = False
-
-        self.model.append_move(selected_piece_copy, clicked_piece_copy)
+    def deselect_piece(self):
+        if self.model.selected_piece is not None:
+            self.model.selected_piece.is_selected = False
+            self.model.selected_piece = None
 
     def undo_move(self):
-        selected_piece = self.model.selected_piece
-        if selected_piece is not None:
-            selected_piece.is_selected = not selected_piece.is_selected
-
-        self.model.color_to_move = not self.model.color_to_move
-
-        if len(self.model.move_log) > 0:
-            is_en_passant_move = self.model.en_passant_move_log.pop()
-            is_castle_move = self.model.castle_move_log.pop()
-
-            if is_en_passant_move:
-                self.en_passant_replace_pieces()
-            elif is_castle_move:
-                self.castle_move_replace_pieces()
-            else:
-                self.regular_replace_pieces()
-
-        # # If the move log is empty, it means we are at the first turn of the game.
-        # # White always moves first
-        if len(self.model.move_log) == 0:
-            self.model.color_to_move = True
-
-        self.model.update_check_status()
-        self.model.undo_castling_rights()
-
-    def regular_replace_pieces(self):
-        selected_piece, clicked_piece = self.model.move_log.pop()
-        self.place_move_on_board(clicked_piece, selected_piece)
-
-    def en_passant_replace_pieces(self):
-        taker_piece, blank_piece = self.model.move_log.pop()
-        taker_piece, captured_piece = self.model.move_log.pop()
-
-        self.place_move_on_board(taker_piece, blank_piece)
-        self.place_move_on_board(taker_piece, captured_piece)
-
-    def place_move_on_board(self, selected_piece, clicked_piece):
-        for piece in (selected_piece, clicked_piece):
-            if piece is not None:
-                self.model.board[piece.row][piece.column] = piece
-                if piece.TYPE == KING and piece.COLOR == WHITE:
-                    self.model.white_king = piece
-                elif piece.TYPE == KING and piece.COLOR == BLACK:
-                    self.model.black_king = piece
-
-    def castle_move_replace_pieces(self):
-        king, king_blank_piece = self.model.move_log.pop()
-        rook, rook_blank_piece = self.model.move_log.pop()
-
-        self.place_move_on_board(king, king_blank_piece)
-        self.place_move_on_board(rook, rook_blank_piece)
-
+        self.deselect_piece()
+        self.model.undo_move()
@@ -1,3 +1,11 @@
+import logging
+from collections import deque
+from queue import SimpleQueue
+from weakref import WeakMethod
+
+logger = logging.getLogger(__name__)
+
+
 class Event:
     """
     A superclass for any events that might be generated by an
@@ -25,8 +33,13 @@ class TickEvent(Event):
     Tick event.
     """
 
-    def __init__(self):
+    def __init__(self, timeout=0):
+        """
+        :param timeout: seconds the controller may block waiting for input during this tick,
+                        None to block until input arrives.
+        """
         self.name = "Tick Event"
+        self.timeout = timeout
 
 
 class InputEvent(Event):
@@ -42,6 +55,29 @@ class InputEvent(Event):
         return '%s, click_pos=%s' % (self.name, self.click_pos)
 
 
+class EngineMoveEvent(Event):
+    """
+    The computer has chosen a move for the position with hash zobrist_key.
+    """
+
+    def __init__(self, move, zobrist_key):
+        self.name = "Engine move event"
+        self.move = move
+        self.zobrist_key = zobrist_key
+
+    def __str__(self):
+        return '%s, move=%s' % (self.name, self.move)
+
+
+class MoveNowEvent(Event):
+    """
+    Asks the computer to play the best move it has found so far.
+    """
+
+    def __init__(self):
+        self.name = "Move now event"
+
+
 class InitializeEvent(Event):
     """
     Tells all listeners to initialize themselves.
@@ -58,38 +94,115 @@ class InitializeEvent(Event):
 class EventManager:
     """
     We coordinate communication between the Model, View, and Controller.
+
+    Handlers subscribe to the event types they want, and get every event of that type or a subclass of it,
+    in the order they subscribed. Events posted while handlers run are queued and dispatched once the current
+    event is done, so handlers never re-enter each other.
     """
 
-    def __init__(self):
-        from weakref import WeakKeyDictionary
-        self.listeners = WeakKeyDictionary()
+    def __init__(self, log=logger):
+        """
+        :param log: logging.Logger that every non-tick event is logged to, at DEBUG level.
+                    Each record has event_type and event attributes for structured formatters.
+        """
+        self.log = log
+        self.subscriptions = []  # (event type, weak reference to the handler) in subscription order
+        self.handlers_by_type = {}  # Cache of the handler references each concrete event type goes to
+        self.queue = deque()
+        self.is_dispatching = False
+        self.thread_events = SimpleQueue()  # Posted by other threads, broadcast on the next tick
+        self.wake_up = None  # Called after an event is posted from another thread, to end a blocking tick
+
+    def subscribe(self, event_type, handler):
+        """
+        Calls handler(event) for each posted event of event_type, including subclasses.
+        Bound methods are held weakly, so subscribing doesn't keep their object alive.
+        """
+
+        handler_ref = WeakMethod(handler) if hasattr(handler, '__self__') else (lambda: handler)
+        self.subscriptions.append((event_type, handler_ref))
+        self.handlers_by_type.clear()
+
+    def unsubscribe(self, event_type, handler):
+        self.subscriptions = [(subscribed_type, handler_ref) for subscribed_type, handler_ref in self.subscriptions
+                              if subscribed_type is not event_type or handler_ref() != handler]
+        self.handlers_by_type.clear()
 
     def register_listener(self, listener):
         """
         Adds a listener to our spam list.
-        It will receive Post()ed events through its notify call.
+        It will receive Post()ed events of every type through its notify call.
         """
 
-        self.listeners[listener] = 1
+        self.subscribe(Event, listener.notify)
 
     def unregister_listener(self, listener):
         """
         Remove a listener from out spam list.
-        This is implemented but hardly used.
-        Our weak ref spam list will auto remove any listeners who stop existing.
+        Our weak refs auto remove any listeners who stop existing.
         """
 
-        if listener in self.listeners:
-            del self.listeners[listener]
+        self.unsubscribe(Event, listener.notify)
+
+    def get_handlers(self, event_type):
+        handler_refs = self.handlers_by_type.get(event_type)
+        if handler_refs is None:
+            handler_refs = [handler_ref for subscribed_type, handler_ref in self.subscriptions
+                            if issubclass(event_type, subscribed_type)]
+            self.handlers_by_type[event_type] = handler_refs
+        return handler_refs
 
     def post(self, event):
         """
         Post a new event to the message queue.
-        It will be broadcast to all listeners.
+        It is dispatched right away, unless it was posted by a handler, in which case it is dispatched
+        after the event being handled, in the order posted.
+
+        A tick may block waiting for input, so events from other threads, and everything their handlers post,
+        are dispatched before it. Otherwise an engine move would not be drawn until the next key press.
+        """
+
+        if self.is_dispatching:
+            self.queue.append(event)
+            return
+
+        self.is_dispatching = True
+        try:
+            if isinstance(event, TickEvent):
+                # Deliver events from other threads here, so handlers only ever run on the main thread
+                while not self.thread_events.empty():
+                    self.queue.append(self.thread_events.get())
+                self.dispatch_queue()
+            self.queue.append(event)
+            self.dispatch_queue()
+        finally:
+            self.is_dispatching = False
+
+    def dispatch_queue(self):
+        while self.queue:
+            self.dispatch(self.queue.popleft())
+
+    def dispatch(self, event):
+        if not isinstance(event, TickEvent) and self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('%s', event, extra={'event_type': type(event).__name__, 'event': event})
+        has_dead_handlers = False
+        for handler_ref in self.get_handlers(type(event)):
+            handler = handler_ref()
+            if handler is None:
+                has_dead_handlers = True
+            else:
+                handler(event)
+        if has_dead_handlers:
+            self.subscriptions = [(event_type, handler_ref) for event_type, handler_ref in self.subscriptions
+                                  if handler_ref() is not None]
+            self.handlers_by_type.clear()
+
+    def post_from_thread(self, event):
+        """
+        Post an event from a thread other than the one running the game loop.
+        It is broadcast at the start of the next tick.
         """
 
-        if not isinstance(event, TickEvent):
-            # print the event (unless it is TickEvent)
-            print(str(event))
-        for listener in self.listeners:
-            listener.notify(event)
+        self.thread_events.put(event)
+        if self.wake_up is not None:
+            self.wake_up()
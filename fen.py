@@ -0,0 +1,183 @@
+from constants import *
+from move import FILE_NAMES, square_name
+from pieces import BLANKS, Pawn, Knight, Bishop, Rook, Queen, King
+from castling_rights import CastlingRights
+from evaluation import compute_evaluation
+from zobrist import compute_hash
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+PIECE_CLASSES = {'p': Pawn, 'n': Knight, 'b': Bishop, 'r': Rook, 'q': Queen, 'k': King}
+PIECE_LETTERS = [None, 'p', 'n', 'b', 'r', 'q', 'k']
+# (piece class, color) of each letter of a FEN placement, uppercase for white
+FEN_PIECES = {**{letter.upper(): (piece_class, WHITE) for letter, piece_class in PIECE_CLASSES.items()},
+              **{letter: (piece_class, BLACK) for letter, piece_class in PIECE_CLASSES.items()}}
+BLANK_RUNS = {str(run): run for run in range(1, 9)}  # Digits of a FEN placement, counting blank squares
+
+
+def parse_placement(placement):
+    """
+    Builds the board of the piece placement field of a FEN string.
+    :return: (board, white king, black king)
+    """
+    ranks = placement.split('/')
+    if len(ranks) != 8:
+        raise ValueError(f'FEN placement needs 8 ranks: {placement}')
+    board = []
+    kings = [None, None]  # Indexed by color
+    for row, rank in enumerate(ranks):
+        board_row = []
+        blank_row = BLANKS[row]
+        column = 0
+        for character in rank:
+            if character in BLANK_RUNS:
+                board_row += blank_row[column:column + BLANK_RUNS[character]]
+                column += BLANK_RUNS[character]
+                continue
+            if character not in FEN_PIECES:
+                raise ValueError(f'unknown piece {character!r} in FEN placement: {placement}')
+            piece_class, color = FEN_PIECES[character]
+            piece = piece_class(color, row, column)
+            if piece_class is King:
+                kings[color] = piece
+            board_row.append(piece)
+            column += 1
+        if column != 8:
+            raise ValueError(f'FEN rank {rank!r} is not 8 squares: {placement}')
+        board.append(board_row)
+    if kings[WHITE] is None or kings[BLACK] is None:
+        raise ValueError(f'FEN placement needs a king of each color: {placement}')
+    return board, kings[WHITE], kings[BLACK]
+
+
+def has_piece(board, row, column, piece_type, color):
+    piece = board[row][column]
+    return piece.TYPE == piece_type and piece.COLOR == color
+
+
+def parse_castling(castling, board):
+    """
+    CastlingRights of white and black from the castling field of a FEN string.
+    A right is only kept if the king is on its home square and a rook of its color on the matching corner,
+    so move generation never castles with a piece that isn't there.
+    """
+    if castling != '-' and (not castling or set(castling) - set('KQkq')):
+        raise ValueError(f'FEN castling field must be - or letters of KQkq: {castling!r}')
+    castling_rights = []
+    for color, home_row, kingside, queenside in ((WHITE, 7, 'K', 'Q'), (BLACK, 0, 'k', 'q')):
+        has_king = has_piece(board, home_row, 4, KING, color)
+        castling_rights.append(CastlingRights(
+            kingside in castling and has_king and has_piece(board, home_row, 7, ROOK, color),
+            queenside in castling and has_king and has_piece(board, home_row, 0, ROOK, color)))
+    return castling_rights
+
+
+def parse_en_passant(en_passant, color_to_move, board):
+    """
+    The (row, column) the side to move can capture en passant on, from the en passant field of a FEN string,
+    or None for -. The square must be behind an enemy pawn that could just have moved two squares.
+    """
+    if en_passant == '-':
+        return None
+    rank, side = ('6', 'white') if color_to_move == WHITE else ('3', 'black')
+    if len(en_passant) != 2 or en_passant[0] not in FILE_NAMES or en_passant[1] != rank:
+        raise ValueError(f'FEN en passant square must be on rank {rank} with {side} to move: {en_passant!r}')
+    row, column = 8 - int(rank), FILE_NAMES.index(en_passant[0])
+    pawn_row = row + 1 if color_to_move == WHITE else row - 1
+    if not has_piece(board, pawn_row, column, PAWN, not color_to_move):
+        raise ValueError(f'FEN en passant square {en_passant} has no enemy pawn past it')
+    return row, column
+
+
+def load_fen(engine, fen):
+    """
+    Sets up engine with the position described by a FEN string, raising ValueError if it is malformed.
+    The move counters are optional. The move logs are cleared, so the position can't be undone past this point.
+    """
+    fields = fen.split()
+    if len(fields) not in (4, 6):
+        raise ValueError(f'FEN needs 4 or 6 fields: {fen}')
+    placement, color, castling, en_passant = fields[:4]
+    if color not in ('w', 'b'):
+        raise ValueError(f'FEN side to move must be w or b: {fen}')
+
+    # Every field is checked before engine is touched, so a malformed FEN leaves it as it was
+    board, white_king, black_king = parse_placement(placement)
+    color_to_move = WHITE if color == 'w' else BLACK
+    white_castling_rights, black_castling_rights = parse_castling(castling, board)
+    en_passant_move = parse_en_passant(en_passant, color_to_move, board)
+    if len(fields) == 6:
+        if not (fields[4].isdigit() and fields[5].isdigit()):
+            raise ValueError(f'FEN move counters must be numbers: {fen}')
+        halfmove_clock, fullmove_number = int(fields[4]), int(fields[5])
+    else:
+        halfmove_clock, fullmove_number = 0, 1
+
+    engine.board, engine.white_king, engine.black_king = board, white_king, black_king
+    engine.color_to_move = color_to_move
+    engine.white_castling_rights, engine.black_castling_rights = white_castling_rights, black_castling_rights
+    engine.en_passant_possible_white = engine.en_passant_possible_black = False
+    engine.en_passant_move_white = engine.en_passant_move_black = ()
+    if en_passant_move is not None:
+        if color_to_move == WHITE:
+            engine.en_passant_possible_white = True
+            engine.en_passant_move_white = en_passant_move
+        else:
+            engine.en_passant_possible_black = True
+            engine.en_passant_move_black = en_passant_move
+    engine.halfmove_clock, engine.fullmove_number = halfmove_clock, fullmove_number
+
+    engine.start_fen = fen  # Where engine.move_log starts from
+    engine.selected_piece = None
+    del engine.move_log[:]
+    del engine.undo_records[:]
+    engine.undo_log = []
+    engine.zobrist_key = compute_hash(engine)
+    engine.midgame_score, engine.endgame_score, engine.phase = compute_evaluation(engine)
+    engine.sync_backend()
+    engine.update_check_status()
+    return engine
+
+
+def to_fen(engine):
+    """
+    Describes the position of engine as a FEN string. The move counters count moves played with
+    GameEngine.play_move(), make_move() leaves them alone.
+    """
+    ranks = []
+    for row in engine.board:
+        rank = ''
+        num_blanks = 0
+        for piece in row:
+            if piece.TYPE == BLANK:
+                num_blanks += 1
+                continue
+            if num_blanks:
+                rank += str(num_blanks)
+                num_blanks = 0
+            letter = PIECE_LETTERS[piece.TYPE]
+            rank += letter.upper() if piece.COLOR == WHITE else letter
+        if num_blanks:
+            rank += str(num_blanks)
+        ranks.append(rank)
+
+    castling = ''
+    if engine.white_castling_rights.can_castle_kingside:
+        castling += 'K'
+    if engine.white_castling_rights.can_castle_queenside:
+        castling += 'Q'
+    if engine.black_castling_rights.can_castle_kingside:
+        castling += 'k'
+    if engine.black_castling_rights.can_castle_queenside:
+        castling += 'q'
+
+    if engine.color_to_move == WHITE and engine.en_passant_possible_white:
+        en_passant = square_name(*engine.en_passant_move_white)
+    elif engine.color_to_move == BLACK and engine.en_passant_possible_black:
+        en_passant = square_name(*engine.en_passant_move_black)
+    else:
+        en_passant = '-'
+
+    color = 'w' if engine.color_to_move == WHITE else 'b'
+    return (f'{"/".join(ranks)} {color} {castling or "-"} {en_passant} '
+            f'{engine.halfmove_clock} {engine.fullmove_number}')
@@ -0,0 +1,58 @@
+"""
+Times how long a fresh interpreter takes to import the engine, which is what every worker process pays
+before it can search.
+
+Each run starts a new Python process, so nothing is cached in sys.modules. The time of an empty
+interpreter is measured the same way and subtracted. The rules core must import without pygame,
+so the benchmark fails if importing the module loads it.
+
+Usage:
+    python import_benchmark.py
+    python import_benchmark.py --module search --runs 50
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PACKAGE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_interpreter(code, runs):
+    """Seconds each of runs fresh interpreters took to run code."""
+    times = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=PACKAGE_DIRECTORY, check=True)
+        times.append(time.perf_counter() - start_time)
+    return times
+
+
+def imports_pygame(module):
+    code = f'import sys\nimport {module}\nsys.exit(1 if "pygame" in sys.modules else 0)'
+    return subprocess.run([sys.executable, '-c', code], cwd=PACKAGE_DIRECTORY).returncode != 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time importing an engine module in a fresh interpreter.')
+    parser.add_argument('--module', default='model', help='module to import')
+    parser.add_argument('--runs', type=int, default=20, help='interpreters to start for each measurement')
+    args = parser.parse_args(argv)
+
+    if imports_pygame(args.module):
+        print(f'import {args.module} loads pygame')
+        return 1
+    baseline_times = time_interpreter('pass', args.runs)
+    import_times = time_interpreter(f'import {args.module}', args.runs)
+    baseline = statistics.median(baseline_times)
+    median = statistics.median(import_times)
+    print(f'Empty interpreter: {baseline * 1000:.1f} ms')
+    print(f'import {args.module}: {median * 1000:.1f} ms, {(median - baseline) * 1000:.1f} ms over the empty '
+          f'interpreter (median of {args.runs}, best {min(import_times) * 1000:.1f} ms)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
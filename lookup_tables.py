@@ -0,0 +1,64 @@
+"""
+Move and attack lookup tables, built once at import.
+
+Every table is indexed [row][column] and holds the board coordinates reachable from that square,
+so move generation never builds a directions list or bounds checks a step.
+"""
+from constants import *
+
+CARDINAL_DIRECTIONS = [(-1, 0), (0, -1), (1, 0), (0, 1)]
+DIAGONAL_DIRECTIONS = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+ALL_DIRECTIONS = CARDINAL_DIRECTIONS + DIAGONAL_DIRECTIONS
+KNIGHT_DIRECTIONS = [(-1, -2), (-1, 2), (1, -2), (1, 2), (-2, -1), (-2, 1), (2, -1), (2, 1)]
+
+
+def on_the_board(row, column):
+    return 0 <= row < 8 and 0 <= column < 8
+
+
+def _build_step_table(directions):
+    return [[tuple((row + d_row, column + d_column) for d_row, d_column in directions
+                   if on_the_board(row + d_row, column + d_column))
+             for column in range(8)]
+            for row in range(8)]
+
+
+def _build_ray(row, column, direction):
+    """Squares from (row, column) to the edge of the board, nearest first."""
+    ray = []
+    end_row, end_column = row + direction[0], column + direction[1]
+    while on_the_board(end_row, end_column):
+        ray.append((end_row, end_column))
+        end_row, end_column = end_row + direction[0], end_column + direction[1]
+    return tuple(ray)
+
+
+def _build_ray_table(directions):
+    return [[tuple(_build_ray(row, column, direction) for direction in directions)
+             for column in range(8)]
+            for row in range(8)]
+
+
+KNIGHT_TARGETS = _build_step_table(KNIGHT_DIRECTIONS)
+KING_TARGETS = _build_step_table(ALL_DIRECTIONS)
+
+# Squares a pawn of each color captures on, indexed [color][row][column]
+PAWN_CAPTURES = [_build_step_table([(1, -1), (1, 1)]),  # Black pawns move towards row 7
+                 _build_step_table([(-1, -1), (-1, 1)])]  # White pawns move towards row 0
+
+# One ray per direction, in the order of the matching directions list
+CARDINAL_RAYS = _build_ray_table(CARDINAL_DIRECTIONS)
+DIAGONAL_RAYS = _build_ray_table(DIAGONAL_DIRECTIONS)
+QUEEN_RAYS = _build_ray_table(ALL_DIRECTIONS)
+
+
+def _build_ray_prefix_table(ray_table):
+    """[row][column][direction][n]: frozenset of the first n + 1 squares of each ray of ray_table."""
+    return [[tuple(tuple(frozenset(ray[:length]) for length in range(1, len(ray) + 1)) for ray in rays)
+             for rays in row_rays]
+            for row_rays in ray_table]
+
+
+# Shared square sets, so finding checks and pins builds none
+QUEEN_RAY_PREFIXES = _build_ray_prefix_table(QUEEN_RAYS)
+SQUARE_SETS = [[frozenset({(row, column)}) for column in range(8)] for row in range(8)]
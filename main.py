@@ -1,16 +1,38 @@
+import argparse
+import logging
+
 import eventmanager
 import model
 import view
 import controller
+import computer_player
+from constants import *
 
 
-def run():
+def run(computer_color=None, time_budget=computer_player.DEFAULT_TIME_BUDGET, show_frame_rate=False):
+    """
+    :param computer_color: the color the computer plays, None for two human players.
+    :param time_budget: seconds the computer thinks per move.
+    :param show_frame_rate: show the frame rate in the window caption.
+    """
     event_manager = eventmanager.EventManager()
     game_model = model.GameEngine(event_manager)
-    keyboard = controller.Keyboard(event_manager, game_model)
-    graphics = view.GraphicalView(event_manager, game_model)
+    human_colors = tuple(color for color in COLORS if color != computer_color)
+    keyboard = controller.Keyboard(event_manager, game_model, human_colors)
+    if computer_color is not None:
+        computer = computer_player.ComputerPlayer(event_manager, game_model, computer_color, time_budget)
+    graphics = view.GraphicalView(event_manager, game_model, show_frame_rate)
     game_model.run()
 
 
 if __name__ == '__main__':
-    run()
+    parser = argparse.ArgumentParser(description='Play chess.')
+    parser.add_argument('--computer', choices=['white', 'black'], help='let the computer play this color')
+    parser.add_argument('--time', type=float, default=computer_player.DEFAULT_TIME_BUDGET,
+                        help='seconds the computer thinks per move')
+    parser.add_argument('--show-fps', action='store_true', help='show the frame rate in the window caption')
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='DEBUG logs every event posted')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format='%(asctime)s %(name)s: %(message)s')
+    run(view.color_name_to_type(args.computer) if args.computer else None, args.time, args.show_fps)
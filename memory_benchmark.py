@@ -0,0 +1,99 @@
+"""
+Measures the memory the engine uses with tracemalloc.
+
+Bytes per position is what keeping one more loaded GameEngine costs: its board, its pieces and its state.
+It is measured for the current layout, slotted pieces sharing one Blank per square, and for the layout
+before it, pieces with an instance __dict__ and a Blank of its own on every empty square, as a baseline.
+The perft run reports the peak traced memory above the loaded position while generating, making and
+unmaking moves, which stays low only if move generation doesn't pile up garbage.
+
+Usage:
+    python memory_benchmark.py
+    python memory_benchmark.py --positions 2000 --depth 3
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+
+from constants import *
+from perft import REFERENCE_POSITIONS, new_engine, perft
+
+SLOTTED_LAYOUT = 'slotted'
+UNSLOTTED_LAYOUT = 'unslotted'
+
+
+class UnslottedPiece:
+    """A piece laid out as before pieces declared __slots__, its fields in an instance __dict__."""
+
+    def __init__(self, piece):
+        self.COLOR = piece.COLOR
+        self.row = piece.row
+        self.column = piece.column
+        self.is_selected = piece.is_selected
+        if piece.TYPE == KING:
+            self.in_check = piece.in_check
+
+
+def use_unslotted_layout(engine):
+    """Replaces the pieces of engine with UnslottedPiece copies, a new one on every square including blanks."""
+    engine.board = [[UnslottedPiece(piece) for piece in row] for row in engine.board]
+    engine.white_king = engine.board[engine.white_king.row][engine.white_king.column]
+    engine.black_king = engine.board[engine.black_king.row][engine.black_king.column]
+
+
+def load_engine(fen, layout):
+    engine = new_engine(fen, OBJECT_BACKEND)
+    if layout == UNSLOTTED_LAYOUT:
+        use_unslotted_layout(engine)
+    return engine
+
+
+def measure_position_bytes(num_positions, layout=SLOTTED_LAYOUT):
+    """Mean traced bytes held by each of num_positions engines loaded from the reference positions."""
+    fens = [fen for _, fen, _ in REFERENCE_POSITIONS]
+    gc.collect()
+    tracemalloc.start()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    engines = [load_engine(fens[index % len(fens)], layout) for index in range(num_positions)]
+    gc.collect()
+    held_bytes = tracemalloc.get_traced_memory()[0] - start_bytes
+    tracemalloc.stop()
+    del engines
+    return held_bytes / num_positions
+
+
+def measure_perft(depth):
+    """:return: (nodes, seconds, peak traced bytes above the loaded start position) of perft to depth."""
+    engine = new_engine(REFERENCE_POSITIONS[0][1], OBJECT_BACKEND)
+    gc.collect()
+    tracemalloc.start()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    start_time = time.perf_counter()
+    nodes = perft(engine, depth)
+    elapsed = time.perf_counter() - start_time
+    peak_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+    tracemalloc.stop()
+    return nodes, elapsed, peak_bytes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the memory of positions and move generation.')
+    parser.add_argument('--positions', type=int, default=1000, help='engines to load for bytes per position')
+    parser.add_argument('--depth', type=int, default=3, help='perft depth to trace')
+    args = parser.parse_args(argv)
+
+    slotted_bytes = measure_position_bytes(args.positions, SLOTTED_LAYOUT)
+    unslotted_bytes = measure_position_bytes(args.positions, UNSLOTTED_LAYOUT)
+    print(f'{slotted_bytes:.0f} bytes per position, {unslotted_bytes:.0f} with unslotted pieces and a Blank '
+          f'per square ({1 - slotted_bytes / unslotted_bytes:.0%} less)')
+    nodes, elapsed, peak_bytes = measure_perft(args.depth)
+    print(f'perft {args.depth}: {nodes} nodes, peak {peak_bytes / 1024:.1f} KiB above the position '
+          f'({elapsed:.2f}s traced)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
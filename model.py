@@ -1,14 +1,24 @@
-from copy import deepcopy
+from array import array
+from collections import OrderedDict
 from constants import *
-from move import Move
+from move import (CAPTURE, DOUBLE_PAWN_PUSH, EN_PASSANT, KINGSIDE_CASTLE, PROMOTION, QUEENSIDE_CASTLE,
+                  QUIET_MOVE, Move, decode_move, encode_move)
+from move_ordering import get_capture_gain, order_moves
+from scheduler import Scheduler
 from eventmanager import *
-from board import Board
-from pieces import Blank
-from castling_rights import CastlingRights
+from evaluation import ENDGAME_SCORES, MIDGAME_SCORES, PHASE_WEIGHTS, compute_evaluation, taper
+from fen import START_FEN, load_fen
+from pieces import PIECE_TYPE_CLASSES, Pawn, get_blank, is_square_attacked
+from bitboard import BitboardPosition
+from zobrist import BLACK_TO_MOVE_KEY, get_castling_key, get_en_passant_key, get_piece_key
 
 COLORS = [WHITE, BLACK] = [True, False]
 COLOR_NAMES = ["black", "white"]
 
+NO_SQUARE = 64  # En passant square of an undo record when there was none
+DELTA_MARGIN = 200  # Centipawns a capture may gain beyond the value of the captured piece, e.g. from position
+LEGAL_MOVE_CACHE_SIZE = 1024  # Pieces whose legal moves get_legal_moves() remembers
+
 
 def get_square_behind(piece):
     if piece.COLOR == WHITE:
@@ -22,148 +32,329 @@ class GameEngine:
     Tracks the game state.
     """
 
-    def __init__(self, event_manager):
+    def __init__(self, event_manager, backend=OBJECT_BACKEND, debug=False, fen=START_FEN):
         """
         event_manager: Allows posting messages to the event queue.
+        backend: OBJECT_BACKEND generates moves from the Piece objects on self.board,
+                 BITBOARD_BACKEND from a BitboardPosition kept in step with it.
+        debug: if True, get_evaluation() asserts that the incremental evaluation matches a full recompute.
+        fen: the position to start from, see fen.load_fen().
 
         Attributes:
         running (bool): True while the engine is online. Changed via QuitEvent().
         """
         self.event_manager = event_manager
-        event_manager.register_listener(self)
+        event_manager.subscribe(QuitEvent, self.on_quit)
         self.running = False
+        self.scheduler = Scheduler()
+
+        # Moves played through the GUI, packed by encode_move(), and for each what undo_move() needs to take it
+        # back, packed by get_undo_record()
+        self.move_log = array('H')
+        self.undo_records = array('I')
+        self.undo_log = []  # Squares and state saved by make_move()
+        # Legal moves of the pieces selected in the GUI by (zobrist_key, row, column), least recently used first.
+        # The hash covers everything the moves depend on, so a move or undo needs no invalidation.
+        self.legal_move_cache = OrderedDict()
+
+        self.backend = backend
+        self.bitboard_position = None
+        self.debug = debug
+
+        # The position, all set by load_fen(): the board and kings, side to move, castling rights, en passant,
+        # move counters, the hash and the sums of the evaluation kept up to date by lift_piece() and place_piece()
+        load_fen(self, fen)
+
+    @classmethod
+    def from_fen(cls, fen, event_manager=None, backend=OBJECT_BACKEND, debug=False):
+        """
+        An engine set up at the position of a FEN string, for analysis without a GUI.
+        :param event_manager: None gives the engine an EventManager of its own.
+        """
+        return cls(event_manager if event_manager is not None else EventManager(), backend, debug, fen)
 
-        self.board = Board().board
-        self.selected_piece = None
-        self.color_to_move = WHITE
-        self.move_log = []
-        self.current_move = None
-
-        self.en_passant_move_log = []  # Did an en passant move happen?
-        self.castle_move_log = []  # Did a castling move happen?
-        self.castling_rights_log = []
-
-        self.white_king = self.board[7][4]
-        self.black_king = self.board[0][4]
-
-        self.en_passant_possible_white = False
-        self.en_passant_move_white = ()
-        self.en_passant_possible_black = False
-        self.en_passant_move_black = ()
-
-        self.white_castling_rights = CastlingRights(True, True)
-        self.black_castling_rights = CastlingRights(True, True)
-
-    def notify(self, event):
+    def sync_backend(self):
         """
-        Called by an event in the message queue.
+        Rebuilds the bitboards from self.board. Needed after the board is changed by anything
+        other than make_move() and unmake_move(), which keep them in step themselves.
         """
-        if isinstance(event, QuitEvent):
-            self.running = False
+        if self.backend == BITBOARD_BACKEND:
+            self.bitboard_position = BitboardPosition.from_engine(self)
+
+    def on_quit(self, event):
+        self.running = False
 
     def run(self):
         """
         Starts the game engine loop
 
-        This pumps a Tick event into the message queue for each loop.
-        The loop ends when this object hears a QuitEvent in notify().
+        Each loop pumps a Tick event into the message queue, during which the controller blocks
+        waiting for input until the next timer of self.scheduler is due, then runs the due timers.
+        With no timers and no input the loop sleeps instead of spinning.
+        The loop ends when this object hears a QuitEvent in on_quit().
         """
         self.running = True
         self.event_manager.post(InitializeEvent())
         while self.running:
-            new_tick = TickEvent()
+            new_tick = TickEvent(self.scheduler.get_timeout())
             self.event_manager.post(new_tick)
+            self.scheduler.run_due_timers()
+
+    def lift_piece(self, piece):
+        """
+        Takes piece out of the hash and the evaluation, before it moves or leaves the board.
+        """
+        self.zobrist_key ^= get_piece_key(piece)
+        self.midgame_score -= MIDGAME_SCORES[piece.COLOR][piece.TYPE][piece.row][piece.column]
+        self.endgame_score -= ENDGAME_SCORES[piece.COLOR][piece.TYPE][piece.row][piece.column]
+        self.phase -= PHASE_WEIGHTS[piece.TYPE]
 
-    def swap(self, blank_piece, selected_piece):
-        blank_piece.row, selected_piece.row = selected_piece.row, blank_piece.row
-        blank_piece.column, selected_piece.column = selected_piece.column, blank_piece.column
+    def place_piece(self, piece):
+        """
+        Adds piece on its new square to the hash and the evaluation.
+        """
+        self.zobrist_key ^= get_piece_key(piece)
+        self.midgame_score += MIDGAME_SCORES[piece.COLOR][piece.TYPE][piece.row][piece.column]
+        self.endgame_score += ENDGAME_SCORES[piece.COLOR][piece.TYPE][piece.row][piece.column]
+        self.phase += PHASE_WEIGHTS[piece.TYPE]
 
-        self.board[blank_piece.row][blank_piece.column] = blank_piece
+    def swap(self, blank_piece, selected_piece, promotion_type=QUEEN):
+        self.lift_piece(selected_piece)
+        start_row = selected_piece.row
+        self.board[start_row][selected_piece.column] = get_blank(start_row, selected_piece.column)
+        selected_piece.row, selected_piece.column = blank_piece.row, blank_piece.column
 
         # Pawn Promotion
         if selected_piece.TYPE == PAWN and selected_piece.should_promote():
-            selected_piece = selected_piece.transform_to_queen()
+            selected_piece = selected_piece.transform_to(promotion_type)
 
-        self.update_en_passant_status(blank_piece.row, selected_piece)
+        self.update_en_passant_status(start_row, selected_piece)
 
         self.board[selected_piece.row][selected_piece.column] = selected_piece
+        self.place_piece(selected_piece)
+
+    def clear_en_passant_status(self):
+        """
+        An en passant capture is only available on the move right after the double pawn push.
+        """
+        self.zobrist_key ^= get_en_passant_key(self)
+        self.en_passant_possible_white = False
+        self.en_passant_move_white = ()
+        self.en_passant_possible_black = False
+        self.en_passant_move_black = ()
+
+    def expire_en_passant_status(self, color):
+        """
+        Called once color has moved: an en passant capture it didn't play is gone.
+        """
+        self.zobrist_key ^= get_en_passant_key(self)
+        if color == WHITE:
+            self.en_passant_possible_white = False
+            self.en_passant_move_white = ()
+        else:
+            self.en_passant_possible_black = False
+            self.en_passant_move_black = ()
+        self.zobrist_key ^= get_en_passant_key(self)
 
     def update_en_passant_status(self, blank_piece_row, selected_piece):
         if selected_piece.TYPE == PAWN and selected_piece.moved_two_squares(blank_piece_row):
+            self.zobrist_key ^= get_en_passant_key(self)
             if selected_piece.COLOR == WHITE:
                 self.en_passant_possible_black = True
                 self.en_passant_move_black = get_square_behind(selected_piece)
             elif selected_piece.COLOR == BLACK:
                 self.en_passant_possible_white = True
                 self.en_passant_move_white = get_square_behind(selected_piece)
+            self.zobrist_key ^= get_en_passant_key(self)
 
-    @staticmethod
-    def swap_with_board(blank_piece, selected_piece, board):
-        blank_piece.row, selected_piece.row = selected_piece.row, blank_piece.row
-        blank_piece.column, selected_piece.column = selected_piece.column, blank_piece.column
-
-        board[blank_piece.row][blank_piece.column] = blank_piece
-
-        # Pawn Promotion
-        if selected_piece.TYPE == PAWN and selected_piece.should_promote():
-            selected_piece = selected_piece.transform_to_queen()
-
-        board[selected_piece.row][selected_piece.column] = selected_piece
-
-    def capture(self, captured_piece, taker_piece):
-        self.board[taker_piece.row][taker_piece.column] = Blank(taker_piece.row, taker_piece.column)
+    def capture(self, captured_piece, taker_piece, promotion_type=QUEEN):
+        self.lift_piece(captured_piece)
+        self.lift_piece(taker_piece)
+        self.board[taker_piece.row][taker_piece.column] = get_blank(taker_piece.row, taker_piece.column)
 
         taker_piece.row, taker_piece.column = captured_piece.row, captured_piece.column
 
         # Pawn Promotion
         if taker_piece.TYPE == PAWN and taker_piece.should_promote():
-            taker_piece = taker_piece.transform_to_queen()
+            taker_piece = taker_piece.transform_to(promotion_type)
 
         self.board[taker_piece.row][taker_piece.column] = taker_piece
+        self.place_piece(taker_piece)
+
+    def get_move_flags(self, move):
+        """The flags encode_move() stores for move, played from the current position."""
+        moved_piece = self.board[move.start_row][move.start_column]
+        target_piece = self.board[move.end_row][move.end_column]
+        if self.is_en_passant_move(target_piece, moved_piece):
+            return EN_PASSANT
+        if self.is_kingside_castle_move(target_piece, moved_piece):
+            return KINGSIDE_CASTLE
+        if self.is_queenside_castle_move(target_piece, moved_piece):
+            return QUEENSIDE_CASTLE
+        if target_piece.TYPE != BLANK:
+            return CAPTURE
+        if moved_piece.TYPE == PAWN and abs(move.end_row - move.start_row) == 2:
+            return DOUBLE_PAWN_PUSH
+        return QUIET_MOVE
+
+    def get_undo_record(self, captured_piece):
+        """
+        Packs the state a GUI move loses into 32 bits: captured piece type | captured color << 3
+        | castling rights << 4 | en passant square << 8 | halfmove clock << 15,
+        where the square is NO_SQUARE if there was none.
+        """
+        record = captured_piece.TYPE
+        if captured_piece.TYPE != BLANK:
+            record |= captured_piece.COLOR << 3
+        for index, can_castle in enumerate((self.white_castling_rights.can_castle_kingside,
+                                            self.white_castling_rights.can_castle_queenside,
+                                            self.black_castling_rights.can_castle_kingside,
+                                            self.black_castling_rights.can_castle_queenside)):
+            record |= can_castle << (4 + index)
+        en_passant_square = NO_SQUARE
+        if self.en_passant_possible_white:
+            en_passant_square = self.en_passant_move_white[0] * 8 + self.en_passant_move_white[1]
+        elif self.en_passant_possible_black:
+            en_passant_square = self.en_passant_move_black[0] * 8 + self.en_passant_move_black[1]
+        return record | en_passant_square << 8 | self.halfmove_clock << 15
+
+    def play_move(self, move):
+        """
+        Plays a legal move on the board shown by the GUI and logs it, so undo_move() can take it back.
+        A pawn reaching the last rank promotes to move.promotion, or a queen if it is None.
+        """
+        moved_piece = self.board[move.start_row][move.start_column]
+        target_piece = self.board[move.end_row][move.end_column]
+        if moved_piece.TYPE == PAWN and move.end_row in (0, 7) and move.promotion is None:
+            move = Move(move.start_row, move.start_column, move.end_row, move.end_column, QUEEN)
+        flags = self.get_move_flags(move)
+        captured_piece = self.get_piece_in_front(target_piece) if flags == EN_PASSANT else target_piece
+        self.move_log.append(encode_move(move, flags))
+        self.undo_records.append(self.get_undo_record(captured_piece))
+
+        color_to_move = self.color_to_move
+        if moved_piece.TYPE == PAWN or captured_piece.TYPE != BLANK:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if color_to_move == BLACK:
+            self.fullmove_number += 1
+        self.update_castling_rights_for_move(moved_piece, target_piece)
+        if flags == EN_PASSANT:
+            self.capture_en_passant(target_piece, moved_piece)
+        elif flags == KINGSIDE_CASTLE:
+            self.castle_kingside(target_piece, moved_piece)
+        elif flags == QUEENSIDE_CASTLE:
+            self.castle_queenside(target_piece, moved_piece)
+        elif target_piece.TYPE == BLANK:
+            self.swap(target_piece, moved_piece, move.promotion or QUEEN)
+        else:
+            self.capture(target_piece, moved_piece, move.promotion or QUEEN)
+        self.switch_color_to_move()
+        self.expire_en_passant_status(color_to_move)
+        self.sync_backend()
+        self.update_check_status()
 
-    @staticmethod
-    def capture_with_board(captured_piece, taker_piece, board):
-        board[taker_piece.row][taker_piece.column] = Blank(taker_piece.row, taker_piece.column)
-
-        taker_piece.row, taker_piece.column = captured_piece.row, captured_piece.column
-
-        # Pawn Promotion
-        if taker_piece.TYPE == PAWN and taker_piece.should_promote():
-            taker_piece = taker_piece.transform_to_queen()
-
-        board[taker_piece.row][taker_piece.column] = taker_piece
+    def undo_move(self):
+        """
+        Takes back the last move of play_move() in constant time, from its encoded move and undo record alone.
+        Does nothing if no move was played.
+        """
+        if not self.move_log:
+            return
+        move, flags = decode_move(self.move_log.pop())
+        record = self.undo_records.pop()
+        self.switch_color_to_move()
+        self.halfmove_clock = record >> 15
+        if self.color_to_move == BLACK:
+            self.fullmove_number -= 1
+
+        moved_piece = self.board[move.end_row][move.end_column]
+        if flags & PROMOTION:
+            self.lift_piece(moved_piece)
+            moved_piece = Pawn(moved_piece.COLOR, move.end_row, move.end_column)
+            self.board[move.end_row][move.end_column] = moved_piece
+            self.place_piece(moved_piece)
+        self.relocate_piece(moved_piece, move.start_row, move.start_column)
+        home_row = move.start_row
+        if flags == KINGSIDE_CASTLE:
+            self.relocate_piece(self.board[home_row][5], home_row, 7)
+        elif flags == QUEENSIDE_CASTLE:
+            self.relocate_piece(self.board[home_row][3], home_row, 0)
+
+        captured_type = record & 7
+        if captured_type != BLANK:
+            captured_row = move.start_row if flags == EN_PASSANT else move.end_row
+            captured_piece = PIECE_TYPE_CLASSES[captured_type](bool(record >> 3 & 1), captured_row, move.end_column)
+            self.board[captured_row][move.end_column] = captured_piece
+            self.place_piece(captured_piece)
+
+        self.zobrist_key ^= get_castling_key(self.white_castling_rights, self.black_castling_rights)
+        self.white_castling_rights.can_castle_kingside = bool(record >> 4 & 1)
+        self.white_castling_rights.can_castle_queenside = bool(record >> 5 & 1)
+        self.black_castling_rights.can_castle_kingside = bool(record >> 6 & 1)
+        self.black_castling_rights.can_castle_queenside = bool(record >> 7 & 1)
+        self.zobrist_key ^= get_castling_key(self.white_castling_rights, self.black_castling_rights)
+
+        self.clear_en_passant_status()
+        en_passant_square = record >> 8 & 127
+        if en_passant_square != NO_SQUARE:
+            if self.color_to_move == WHITE:
+                self.en_passant_possible_white = True
+                self.en_passant_move_white = divmod(en_passant_square, 8)
+            else:
+                self.en_passant_possible_black = True
+                self.en_passant_move_black = divmod(en_passant_square, 8)
+            self.zobrist_key ^= get_en_passant_key(self)
 
-    def append_move(self, selected_piece, clicked_piece):
-        is_en_passant_move = self.is_en_passant_move(clicked_piece, selected_piece)
-        self.en_passant_move_log.append(is_en_passant_move)
+        self.sync_backend()
+        self.update_check_status()
 
-        is_kingside_castle_move = self.is_kingside_castle_move(clicked_piece, selected_piece)
-        is_queenside_castle_move = self.is_queenside_castle_move(clicked_piece, selected_piece)
-        self.castle_move_log.append(is_kingside_castle_move or is_queenside_castle_move)
+    def relocate_piece(self, piece, row, column):
+        """Moves piece to the blank square at row, column, leaving a blank behind."""
+        self.lift_piece(piece)
+        self.board[piece.row][piece.column] = get_blank(piece.row, piece.column)
+        piece.row, piece.column = row, column
+        self.board[row][column] = piece
+        self.place_piece(piece)
 
-        self.castling_rights_log.append((deepcopy(self.white_castling_rights), deepcopy(self.black_castling_rights)))
+    def get_pseudo_legal_moves(self, piece=None):
+        """Squares piece, by default the selected piece, can move to ignoring checks, except by castling."""
+        if piece is None:
+            piece = self.selected_piece
+        pseudo_legal_moves = piece.get_pseudo_legal_moves(self.board)
 
-        if is_en_passant_move:
-            self.move_log.append((selected_piece, self.get_piece_in_front(clicked_piece)))
-        elif is_kingside_castle_move:
-            self.move_log.append((self.get_kingside_castle_rook_move_copy()))
-        elif is_queenside_castle_move:
-            self.move_log.append(self.get_queenside_castle_rook_move_copy())
+        if piece.TYPE == PAWN and self.is_en_passant_possible():
+            pseudo_legal_moves = self.update_pseudo_legal_moves_for_en_passant(pseudo_legal_moves, piece, self.board)
 
-        self.move_log.append((selected_piece, clicked_piece))
-        self.current_move = Move(selected_piece.row, selected_piece.column, clicked_piece.row, clicked_piece.column)
+        return pseudo_legal_moves
 
-    def get_pseudo_legal_moves(self):
-        pseudo_legal_moves = self.selected_piece.get_pseudo_legal_moves(self.board)
+    def is_legal_move(self, move):
+        """Whether a pseudo-legal move of the side to move leaves its king out of check."""
+        color = self.color_to_move
+        self.make_move(move)
+        in_check = self.is_in_check(color)
+        self.unmake_move()
+        return not in_check
 
-        if self.selected_piece.TYPE == PAWN and self.is_en_passant_possible():
-            pseudo_legal_moves = self.update_pseudo_legal_moves_for_en_passant(pseudo_legal_moves,
-                                                                               self.selected_piece,
-                                                                               self.board)
+    def get_legal_moves(self):
+        """
+        Squares the selected piece can move to, as (row, column) tuples. Cached per position and square,
+        since the controller and the view ask for the same piece on every click and frame.
+        """
+        cache_key = (self.zobrist_key, self.selected_piece.row, self.selected_piece.column)
+        legal_moves = self.legal_move_cache.get(cache_key)
+        if legal_moves is not None:
+            self.legal_move_cache.move_to_end(cache_key)
+            return legal_moves
 
-        return pseudo_legal_moves
+        legal_moves = frozenset(self.compute_legal_moves())
+        self.legal_move_cache[cache_key] = legal_moves
+        if len(self.legal_move_cache) > LEGAL_MOVE_CACHE_SIZE:
+            self.legal_move_cache.popitem(last=False)
+        return legal_moves
 
-    def get_legal_moves(self):
+    def compute_legal_moves(self):
         pseudo_legal_moves = self.get_pseudo_legal_moves()
         legal_moves = self.remove_illegal_moves(pseudo_legal_moves)
         legal_moves = self.update_for_castling_moves(legal_moves)
@@ -172,56 +363,255 @@ class GameEngine:
 
     def remove_illegal_moves(self, pseudo_legal_moves):
         legal_moves = set()
+        selected_piece = self.selected_piece
+        king = self.white_king if self.color_to_move == WHITE else self.black_king
         for move in pseudo_legal_moves:
-            board_copy, white_king, black_king = self.copy_board_and_kings()
-            self.try_pseudo_legal_move(board_copy, move)
-            white_king_check_status, black_king_check_status = self.get_check_status_with_board_and_kings(board_copy,
-                                                                                                          white_king,
-                                                                                                          black_king)
-            if self.color_to_move == WHITE:
-                in_check = white_king_check_status
-            else:
-                in_check = black_king_check_status
+            end_row, end_column = move
+            self.make_move(Move(selected_piece.row, selected_piece.column, end_row, end_column))
+            in_check = king.get_check_status(self.board)
+            self.unmake_move()
 
             if not in_check:
                 legal_moves.add(move)
         return legal_moves
 
-    def get_check_status(self):
-        white_king_check_status = self.white_king.get_check_status(self.board)
-        black_king_check_status = self.black_king.get_check_status(self.board)
-        return white_king_check_status, black_king_check_status
+    def make_move(self, move):
+        """
+        Plays move in place on self.board for the side to move.
 
-    @staticmethod
-    def get_check_status_with_board_and_kings(board, white_king, black_king):
-        white_king_check_status = white_king.get_check_status(board)
-        black_king_check_status = black_king.get_check_status(board)
-        return white_king_check_status, black_king_check_status
+        Every square the move touches is recorded together with the side to move, en passant and castling
+        state and the hash, so unmake_move() can put the position back exactly without copying the board.
+        The king objects stay the same, so white_king and black_king stay valid.
+        """
+        moved_piece = self.board[move.start_row][move.start_column]
+        target_piece = self.board[move.end_row][move.end_column]
+        touched_squares = [(moved_piece, move.start_row, move.start_column),
+                           (target_piece, move.end_row, move.end_column)]
+        self.undo_log.append((touched_squares, self.get_position_state()))
+        if self.bitboard_position is not None:
+            self.bitboard_position.make_move(self.bitboard_position.encode(move))
+
+        is_en_passant_move = self.is_en_passant_move(target_piece, moved_piece)
+        self.update_castling_rights_for_move(moved_piece, target_piece)
+        self.clear_en_passant_status()
 
-    def update_check_status(self):
-        self.white_king.in_check, self.black_king.in_check = self.get_check_status()
+        if is_en_passant_move:
+            captured_piece = self.get_piece_in_front(target_piece)
+            touched_squares.append((captured_piece, captured_piece.row, captured_piece.column))
+            self.capture_en_passant(target_piece, moved_piece)
+        elif self.is_kingside_castle_move(target_piece, moved_piece):
+            end_square, kingside_rook = self.get_kingside_castle_rook_move()
+            touched_squares.append((kingside_rook, kingside_rook.row, kingside_rook.column))
+            touched_squares.append((end_square, end_square.row, end_square.column))
+            self.castle_kingside(target_piece, moved_piece)
+        elif self.is_queenside_castle_move(target_piece, moved_piece):
+            end_square, queenside_rook = self.get_queenside_castle_rook_move()
+            touched_squares.append((queenside_rook, queenside_rook.row, queenside_rook.column))
+            touched_squares.append((end_square, end_square.row, end_square.column))
+            self.castle_queenside(target_piece, moved_piece)
+        elif target_piece.TYPE == BLANK:
+            self.swap(target_piece, moved_piece, move.promotion or QUEEN)
+        else:
+            self.capture(target_piece, moved_piece, move.promotion or QUEEN)
+
+        self.switch_color_to_move()
+
+    def unmake_move(self):
+        """
+        Takes back the last move played with make_move().
+        """
+        touched_squares, position_state = self.undo_log.pop()
+        if self.bitboard_position is not None:
+            self.bitboard_position.unmake_move()
+        for piece, row, column in touched_squares:
+            piece.row, piece.column = row, column
+            self.board[row][column] = piece
+        self.set_position_state(position_state)
+
+    def switch_color_to_move(self):
+        self.color_to_move = not self.color_to_move
+        self.zobrist_key ^= BLACK_TO_MOVE_KEY
+
+    def get_position_state(self):
+        """
+        The non-board state that a move can change, including the hash and the incremental evaluation.
+        """
+        return (self.zobrist_key, self.midgame_score, self.endgame_score, self.phase, self.color_to_move,
+                self.en_passant_possible_white, self.en_passant_move_white,
+                self.en_passant_possible_black, self.en_passant_move_black,
+                self.white_castling_rights.can_castle_kingside, self.white_castling_rights.can_castle_queenside,
+                self.black_castling_rights.can_castle_kingside, self.black_castling_rights.can_castle_queenside)
+
+    def set_position_state(self, position_state):
+        (self.zobrist_key, self.midgame_score, self.endgame_score, self.phase, self.color_to_move,
+         self.en_passant_possible_white, self.en_passant_move_white,
+         self.en_passant_possible_black, self.en_passant_move_black,
+         self.white_castling_rights.can_castle_kingside, self.white_castling_rights.can_castle_queenside,
+         self.black_castling_rights.can_castle_kingside, self.black_castling_rights.can_castle_queenside) = position_state
+
+    def get_king(self, color):
+        return self.white_king if color == WHITE else self.black_king
+
+    def generate_legal_moves(self, color, captures_only=False):
+        """
+        Returns every legal Move for color, or with captures_only only the captures and promotions.
+
+        Checking pieces and pins are found once by walking outward from the king, so moves are filtered by
+        set intersection instead of being played out. Only en passant captures, which can expose the king
+        along the rank of the two pawns, are verified with make_move().
+        """
+        if self.backend == BITBOARD_BACKEND:
+            legal_moves = [BitboardPosition.to_move(move) for move in self.bitboard_position.generate_legal_moves(color)]
+            if captures_only:
+                return [move for move in legal_moves if get_capture_gain(self.board, move)]
+            return legal_moves
+
+        king = self.get_king(color)
+        checks, pins = king.get_checks_and_pins(self.board)
+        legal_moves = self.generate_legal_king_moves(king, checks, captures_only)
+        if len(checks) > 1:  # Double check, only the king can move
+            return legal_moves
+
+        check_block_squares = checks[0] if checks else None
+        en_passant_move = self.en_passant_move_white if color == WHITE else self.en_passant_move_black
+        for row in self.board:
+            for piece in row:
+                if piece.COLOR != color or piece.TYPE == KING:
+                    continue
+                if captures_only:
+                    end_squares = piece.get_pseudo_legal_captures(self.board)
+                else:
+                    end_squares = piece.get_pseudo_legal_moves(self.board)
+                if piece.TYPE == PAWN and self.is_en_passant_possible():
+                    end_squares = self.update_pseudo_legal_moves_for_en_passant(end_squares, piece, self.board)
+                pin_squares = pins.get((piece.row, piece.column))
+
+                for end_square in end_squares:
+                    if piece.TYPE == PAWN and end_square == en_passant_move:
+                        if self.is_legal_en_passant_move(piece, end_square, king):
+                            legal_moves.append(Move(piece.row, piece.column, *end_square))
+                        continue
+                    if pin_squares is not None and end_square not in pin_squares:
+                        continue
+                    if check_block_squares is not None and end_square not in check_block_squares:
+                        continue
+
+                    end_row, end_column = end_square
+                    if piece.TYPE == PAWN and end_row in (0, 7):
+                        for promotion_type in (QUEEN, ROOK, BISHOP, KNIGHT):
+                            legal_moves.append(Move(piece.row, piece.column, end_row, end_column, promotion_type))
+                    else:
+                        legal_moves.append(Move(piece.row, piece.column, end_row, end_column))
+        return legal_moves
+
+    def generate_ordered_moves(self, color, hint_moves=(), orderer=None, ply=None):
+        """
+        Returns every legal Move for color, best first: hint_moves, then captures and promotions by MVV-LVA,
+        then the quiet moves by the killers and history of orderer, a MoveOrderer, if given.
+        """
+        return order_moves(self.board, self.generate_legal_moves(color), color, hint_moves, orderer, ply)
+
+    def get_material_balance(self):
+        """
+        Material in centipawns from the point of view of the side to move.
+        """
+        score = 0
+        for row in self.board:
+            for piece in row:
+                if piece.TYPE != BLANK:
+                    score += PIECE_VALUES[piece.TYPE] if piece.COLOR == WHITE else -PIECE_VALUES[piece.TYPE]
+        return score if self.color_to_move == WHITE else -score
+
+    def get_evaluation(self):
+        """
+        Tapered material and piece-square-table score in centipawns from the point of view of the side to move.
+        O(1): the sums it blends are kept up to date as pieces move.
+        """
+        if self.debug:
+            assert (self.midgame_score, self.endgame_score, self.phase) == compute_evaluation(self), \
+                'incremental evaluation out of step with the board'
+        score = taper(self.midgame_score, self.endgame_score, self.phase)
+        return score if self.color_to_move == WHITE else -score
+
+    def resolve_captures(self, alpha=-INFINITY, beta=INFINITY, evaluate=None):
+        """
+        Quiescence search: plays out the pending captures and promotions, best first by MVV-LVA,
+        and returns the score of the position for the side to move once none are worth playing.
 
-    def try_pseudo_legal_move(self, board_copy, move):
-        target_piece_row, target_piece_column = move
-        target_piece = board_copy[target_piece_row][target_piece_column]
+        The side to move may always stand pat, declining every capture, so the static score is a lower bound.
+        Captures that can't raise the score to alpha even by winning the captured piece for free
+        (delta pruning) are skipped.
 
-        selected_piece_row, selected_piece_column = self.selected_piece.row, self.selected_piece.column
-        selected_piece_copy = board_copy[selected_piece_row][selected_piece_column]
-        if target_piece.TYPE == BLANK:
-            self.swap_with_board(target_piece, selected_piece_copy, board_copy)
+        :param evaluate: static evaluation, called with the engine, scoring for the side to move.
+                         Defaults to get_evaluation().
+        """
+        stand_pat = evaluate(self) if evaluate is not None else self.get_evaluation()
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        color = self.color_to_move
+        for move in order_moves(self.board, self.generate_legal_moves(color, captures_only=True), color):
+            if stand_pat + get_capture_gain(self.board, move) + DELTA_MARGIN <= alpha:
+                continue
+            self.make_move(move)
+            score = -self.resolve_captures(-beta, -alpha, evaluate)
+            self.unmake_move()
+            if score >= beta:
+                return score
+            alpha = max(alpha, score)
+        return alpha
+
+    def generate_legal_king_moves(self, king, checks, captures_only=False):
+        legal_moves = []
+        if captures_only:
+            end_squares = king.get_pseudo_legal_captures(self.board)
         else:
-            self.capture_with_board(target_piece, selected_piece_copy, board_copy)
+            end_squares = king.get_pseudo_legal_moves(self.board)
+        for end_row, end_column in end_squares:
+            if not is_square_attacked(self.board, end_row, end_column, king.COLOR, ignored_piece=king):
+                legal_moves.append(Move(king.row, king.column, end_row, end_column))
+
+        if checks or captures_only:  # Can't castle out of check
+            return legal_moves
 
-    def copy_board_and_kings(self):
-        board_copy = deepcopy(self.board)
+        castling_rights = self.white_castling_rights if king.COLOR == WHITE else self.black_castling_rights
+        if (castling_rights.can_castle_kingside and self.are_kingside_squares_blank(king)
+                and self.is_castling_rook(self.board[king.row][7], king.COLOR)
+                and not is_square_attacked(self.board, king.row, king.column + 1, king.COLOR)
+                and not is_square_attacked(self.board, king.row, king.column + 2, king.COLOR)):
+            legal_moves.append(Move(king.row, king.column, king.row, king.column + 2))
+
+        if (castling_rights.can_castle_queenside and self.are_queenside_squares_blank(king)
+                and self.is_castling_rook(self.board[king.row][0], king.COLOR)
+                and not is_square_attacked(self.board, king.row, king.column - 1, king.COLOR)
+                and not is_square_attacked(self.board, king.row, king.column - 2, king.COLOR)):
+            legal_moves.append(Move(king.row, king.column, king.row, king.column - 2))
+        return legal_moves
 
-        white_king_row, white_king_column = self.white_king.row, self.white_king.column
-        black_king_row, black_king_column = self.black_king.row, self.black_king.column
+    @staticmethod
+    def is_castling_rook(piece, color):
+        return piece.TYPE == ROOK and piece.COLOR == color
+
+    def is_legal_en_passant_move(self, pawn, end_square, king):
+        color_to_move = self.color_to_move
+        self.color_to_move = pawn.COLOR  # make_move() plays for the side to move
+        self.make_move(Move(pawn.row, pawn.column, *end_square))
+        in_check = king.get_check_status(self.board)
+        self.unmake_move()
+        self.color_to_move = color_to_move  # The hash was restored by unmake_move()
+        return not in_check
+
+    def is_in_check(self, color):
+        if self.backend == BITBOARD_BACKEND:
+            return self.bitboard_position.is_in_check(color)
+        return self.get_king(color).get_check_status(self.board)
 
-        white_king = board_copy[white_king_row][white_king_column]
-        black_king = board_copy[black_king_row][black_king_column]
+    def get_check_status(self):
+        return self.is_in_check(WHITE), self.is_in_check(BLACK)
 
-        return board_copy, white_king, black_king
+    def update_check_status(self):
+        self.white_king.in_check, self.black_king.in_check = self.get_check_status()
 
     def update_pseudo_legal_moves_for_en_passant(self, pseudo_legal_moves, selected_pawn, board):
         if selected_pawn.COLOR == WHITE and self.en_passant_possible_white:
@@ -273,13 +663,17 @@ class GameEngine:
         elif self.color_to_move == BLACK:
             return self.black_castling_rights.can_castle_queenside
 
-    def update_castling_rights(self):
-        if self.selected_piece.TYPE == KING:
-            self.disable_castling_rights_after_king_move(self.selected_piece)
-        if self.selected_piece.TYPE == ROOK:
-            self.disable_castling_rights_after_rook_move(self.selected_piece)
+    def update_castling_rights_for_move(self, moved_piece, target_piece):
+        if moved_piece.TYPE == KING:
+            self.disable_castling_rights_after_king_move(moved_piece)
+        elif moved_piece.TYPE == ROOK:
+            self.disable_castling_rights_after_rook_move(moved_piece)
+        if target_piece.TYPE == ROOK:
+            # A rook captured on its starting square can no longer castle
+            self.disable_castling_rights_after_rook_move(target_piece)
 
     def disable_castling_rights_after_rook_move(self, selected_piece):
+        self.zobrist_key ^= get_castling_key(self.white_castling_rights, self.black_castling_rights)
         if selected_piece.COLOR == WHITE:
             if (selected_piece.row, selected_piece.column) == (7, 7):
                 self.white_castling_rights.can_castle_kingside = False
@@ -290,14 +684,17 @@ class GameEngine:
                 self.black_castling_rights.can_castle_kingside = False
             elif (selected_piece.row, selected_piece.column) == (0, 0):
                 self.black_castling_rights.can_castle_queenside = False
+        self.zobrist_key ^= get_castling_key(self.white_castling_rights, self.black_castling_rights)
 
     def disable_castling_rights_after_king_move(self, selected_piece):
+        self.zobrist_key ^= get_castling_key(self.white_castling_rights, self.black_castling_rights)
         if selected_piece.COLOR == WHITE:
             self.white_castling_rights.can_castle_kingside = False
             self.white_castling_rights.can_castle_queenside = False
         elif selected_piece.COLOR == BLACK:
             self.black_castling_rights.can_castle_kingside = False
             self.black_castling_rights.can_castle_queenside = False
+        self.zobrist_key ^= get_castling_key(self.white_castling_rights, self.black_castling_rights)
 
     def update_for_castling_moves(self, legal_moves):
         if self.selected_piece.TYPE == KING and self.is_castling_kingside_possible():
@@ -371,18 +768,6 @@ class GameEngine:
             end_square = self.board[0][5]
         return end_square, kingside_rook
 
-    def get_kingside_castle_rook_move_copy(self):
-        if self.color_to_move == WHITE:
-            kingside_rook = self.board[7][7]
-            end_square = self.board[7][5]
-        else:  # Black to move
-            kingside_rook = self.board[0][7]
-            end_square = self.board[0][5]
-
-        kingside_rook_copy = deepcopy(kingside_rook)
-        end_square_copy = deepcopy(end_square)
-        return kingside_rook_copy, end_square_copy
-
     def castle_queenside(self, blank_piece, selected_king):
         self.swap(blank_piece, selected_king)
 
@@ -399,19 +784,3 @@ class GameEngine:
             end_square = self.board[0][3]
 
         return end_square, queenside_rook
-
-    def get_queenside_castle_rook_move_copy(self):
-        if self.color_to_move == WHITE:
-            queenside_rook = self.board[7][0]
-            end_square = self.board[7][3]
-        else:  # Black to move
-            queenside_rook = self.board[0][0]
-            end_square = self.board[0][3]
-
-        queenside_rook_copy = deepcopy(queenside_rook)
-        end_square_copy = deepcopy(end_square)
-
-        return queenside_rook_copy, end_square_copy
-
-    def undo_castling_rights(self):
-        self.white_castling_rights, self.black_castling_rights = self.castling_rights_log.pop()
@@ -1,6 +1,73 @@
+from constants import *
+
+FILE_NAMES = 'abcdefgh'
+PROMOTION_LETTERS = {KNIGHT: 'n', BISHOP: 'b', ROOK: 'r', QUEEN: 'q'}
+
+# Flags of an encoded move, in its top 4 bits. A promotion adds its piece type - KNIGHT to PROMOTION.
+QUIET_MOVE, DOUBLE_PAWN_PUSH, KINGSIDE_CASTLE, QUEENSIDE_CASTLE, CAPTURE, EN_PASSANT = range(6)
+PROMOTION = 8  # Combined with CAPTURE for a capturing promotion
+
+
 class Move:
-    def __init__(self, start_row, start_column, end_row, end_column):
+    def __init__(self, start_row, start_column, end_row, end_column, promotion=None):
         self.start_row = start_row
         self.start_column = start_column
         self.end_row = end_row
         self.end_column = end_column
+        self.promotion = promotion  # Piece type a pawn promotes to, None if the move is not a promotion
+
+    def __eq__(self, other):
+        return (isinstance(other, Move)
+                and (self.start_row, self.start_column, self.end_row, self.end_column, self.promotion)
+                == (other.start_row, other.start_column, other.end_row, other.end_column, other.promotion))
+
+    def __hash__(self):
+        return hash((self.start_row, self.start_column, self.end_row, self.end_column, self.promotion))
+
+    def to_int(self):
+        """
+        Packs the move into 16 bits: start square | end square << 6 | promotion piece type << 12,
+        where a square is row * 8 + column. 0 never encodes a real move.
+        """
+        return ((self.start_row * 8 + self.start_column)
+                | (self.end_row * 8 + self.end_column) << 6
+                | (self.promotion or 0) << 12)
+
+    @classmethod
+    def from_int(cls, value):
+        start_row, start_column = divmod(value & 63, 8)
+        end_row, end_column = divmod((value >> 6) & 63, 8)
+        promotion = value >> 12
+        return cls(start_row, start_column, end_row, end_column, promotion or None)
+
+    def __str__(self):
+        """Coordinate notation, e.g. e2e4 or e7e8q."""
+        promotion = PROMOTION_LETTERS[self.promotion] if self.promotion is not None else ''
+        return square_name(self.start_row, self.start_column) + square_name(self.end_row, self.end_column) + promotion
+
+    def __repr__(self):
+        return f'Move({self})'
+
+
+def square_name(row, column):
+    return FILE_NAMES[column] + str(8 - row)
+
+
+def encode_move(move, flags):
+    """
+    Packs a played move into 16 bits: start square | end square << 6 | flags << 12, where flags says what kind
+    of move it was in its position. Unlike Move.to_int(), the value is enough to take the move back.
+    """
+    if move.promotion is not None:
+        flags |= PROMOTION | (move.promotion - KNIGHT)
+    return (move.start_row * 8 + move.start_column) | (move.end_row * 8 + move.end_column) << 6 | flags << 12
+
+
+def decode_move(value):
+    """:return: (Move, flags) packed by encode_move(), the flags without the promotion piece."""
+    start_row, start_column = divmod(value & 63, 8)
+    end_row, end_column = divmod((value >> 6) & 63, 8)
+    flags = value >> 12
+    if flags & PROMOTION:
+        return Move(start_row, start_column, end_row, end_column, KNIGHT + (flags & 3)), flags & ~3
+    return Move(start_row, start_column, end_row, end_column), flags
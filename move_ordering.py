@@ -0,0 +1,194 @@
+"""
+Orders moves so that the best is likely to be tried first.
+
+Hint moves from the caller, such as a transposition table move, come first. Then captures and promotions by
+MVV-LVA (most valuable victim, least valuable attacker), then the killer moves of the ply, which caused a
+cutoff in a sibling position, then the remaining quiet moves by their butterfly history score.
+
+Usage:
+    python move_ordering.py --iterations 100
+"""
+import argparse
+import sys
+import time
+
+from constants import *
+
+HINT_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORE = 1 << 26  # Above every history score, below every capture
+MAX_HISTORY_SCORE = 1 << 24  # All history scores are halved when one reaches this
+NUM_KILLERS = 2
+MAX_PLY = 128
+
+
+def get_capture_gain(board, move):
+    """
+    Material won by a capture or promotion, in centipawns, if the moved piece is not recaptured.
+    0 for quiet moves.
+    """
+    victim_type = board[move.end_row][move.end_column].TYPE
+    if (victim_type == BLANK and move.start_column != move.end_column
+            and board[move.start_row][move.start_column].TYPE == PAWN):
+        victim_type = PAWN  # En passant
+    gain = PIECE_VALUES[victim_type]
+    if move.promotion is not None:
+        gain += PIECE_VALUES[move.promotion] - PIECE_VALUES[PAWN]
+    return gain
+
+
+def get_mvv_lva_score(board, move):
+    """
+    Orders captures by the value of the captured piece, then by the lowest value of the capturing piece.
+    A promotion is scored as capturing the piece promoted to. Quiet moves score 0.
+    """
+    gain = get_capture_gain(board, move)
+    if gain == 0:
+        return 0
+    return gain * 8 - board[move.start_row][move.start_column].TYPE
+
+
+def order_moves(board, moves, color, hint_moves=(), orderer=None, ply=None):
+    """
+    Returns moves sorted best first. Hint moves that are in moves lead, in the order given.
+
+    :param orderer: MoveOrderer whose killers and history order the quiet moves. Without one,
+                    only captures and promotions are ordered.
+    :param ply: distance from the root, selects the killer moves. None skips killers.
+    """
+    hint_moves = [move for move in hint_moves if move is not None]
+    scored_moves = []
+    for move in moves:
+        if move in hint_moves:
+            score = HINT_SCORE - hint_moves.index(move)
+        elif orderer is not None:
+            score = orderer.score_move(board, move, color, ply)
+        else:
+            score = get_mvv_lva_score(board, move)
+        scored_moves.append((score, move))
+    scored_moves.sort(key=lambda scored_move: scored_move[0], reverse=True)
+    return [move for _, move in scored_moves]
+
+
+class MoveOrderer:
+    """
+    Killer moves and butterfly history gathered during a search, and statistics on how well they order.
+    Callers report cutoffs with record_cutoff(), and the best move of each node with record_best_move().
+    """
+
+    def __init__(self, max_ply=MAX_PLY):
+        self.max_ply = max_ply
+        self.killers = [[None] * NUM_KILLERS for _ in range(max_ply)]  # [ply][slot]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in COLORS]  # [color][start square][end square]
+
+        self.nodes_with_best_move = 0
+        self.first_move_best = 0
+        self.best_move_index_total = 0
+
+    def clear(self):
+        """Forgets killers and history, e.g. before searching an unrelated position."""
+        self.killers = [[None] * NUM_KILLERS for _ in range(self.max_ply)]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in COLORS]
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.nodes_with_best_move = 0
+        self.first_move_best = 0
+        self.best_move_index_total = 0
+
+    def score_move(self, board, move, color, ply):
+        mvv_lva_score = get_mvv_lva_score(board, move)
+        if mvv_lva_score:
+            return CAPTURE_SCORE + mvv_lva_score
+        if ply is not None and ply < self.max_ply:
+            killers = self.killers[ply]
+            if move in killers:
+                return KILLER_SCORE + NUM_KILLERS - killers.index(move)
+        return self.history[color][move.start_row * 8 + move.start_column][move.end_row * 8 + move.end_column]
+
+    def record_cutoff(self, board, move, color, ply, depth):
+        """
+        Remembers a quiet move that caused a beta cutoff. board must be the position the move is played from,
+        so captures and promotions, which MVV-LVA already orders, can be told apart from quiet moves.
+        """
+        if get_mvv_lva_score(board, move):
+            return
+        if ply < self.max_ply:
+            killers = self.killers[ply]
+            if move != killers[0]:
+                killers[1:] = killers[:-1]
+                killers[0] = move
+
+        color_history = self.history[color]
+        start_square = move.start_row * 8 + move.start_column
+        end_square = move.end_row * 8 + move.end_column
+        color_history[start_square][end_square] += depth * depth
+        if color_history[start_square][end_square] >= MAX_HISTORY_SCORE:
+            self.age_history()
+
+    def age_history(self):
+        """Halves every history score, so recent cutoffs outweigh old ones."""
+        for color_history in self.history:
+            for start_square_history in color_history:
+                for end_square in range(64):
+                    start_square_history[end_square] >>= 1
+
+    def record_best_move(self, index):
+        """Counts the position in the ordered moves of a node's best move, 0 being the first."""
+        self.nodes_with_best_move += 1
+        self.best_move_index_total += index
+        if index == 0:
+            self.first_move_best += 1
+
+    def get_first_move_best_rate(self):
+        return self.first_move_best / self.nodes_with_best_move if self.nodes_with_best_move else 0.0
+
+    def get_average_best_move_index(self):
+        return self.best_move_index_total / self.nodes_with_best_move if self.nodes_with_best_move else 0.0
+
+    def __str__(self):
+        return (f'first move best in {self.first_move_best} of {self.nodes_with_best_move} nodes '
+                f'({self.get_first_move_best_rate():.1%}), '
+                f'average best move index {self.get_average_best_move_index():.2f}')
+
+
+def benchmark(iterations):
+    """
+    Times plain and ordered move generation in each perft reference position.
+    Returns a list of (name, number of moves, plain microseconds, ordered microseconds) per position.
+    """
+    from perft import REFERENCE_POSITIONS, new_engine  # perft imports model, which imports this module
+
+    orderer = MoveOrderer()
+    results = []
+    for name, fen, _ in REFERENCE_POSITIONS:
+        engine = new_engine(fen)
+        color = engine.color_to_move
+
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            moves = engine.generate_legal_moves(color)
+        plain_elapsed = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in range(iterations):
+            engine.generate_ordered_moves(color, orderer=orderer, ply=0)
+        ordered_elapsed = time.perf_counter() - start_time
+
+        results.append((name, len(moves), plain_elapsed / iterations * 1e6, ordered_elapsed / iterations * 1e6))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the cost of ordering moves.')
+    parser.add_argument('--iterations', type=int, default=200, help='times to generate the moves of each position')
+    args = parser.parse_args(argv)
+
+    for name, num_moves, plain_time, ordered_time in benchmark(args.iterations):
+        print(f'{name}: {num_moves} moves, generated in {plain_time:.1f}us, ordered in {ordered_time:.1f}us '
+              f'(+{ordered_time - plain_time:.1f}us, {(ordered_time - plain_time) / num_moves:.2f}us per move)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
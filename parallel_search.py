@@ -0,0 +1,160 @@
+"""
+Searches the root moves of a position in several processes at once.
+
+The legal root moves are dealt out to the workers best first, so each gets a share of the likely good moves.
+Every worker searches its moves to a fixed depth with alpha-beta, probing and storing into one
+SharedTranspositionTable so that subpositions reached through different root moves are searched once.
+The parent picks the best move among the workers' results.
+
+Usage:
+    python parallel_search.py --depth 4 --workers 8
+    python parallel_search.py --fen "<fen>" --depth 4 --workers 8 --speedup
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import *
+from fen import START_FEN, to_fen
+from move import Move
+from perft import new_engine
+from search import MATE_SCORE, Searcher
+from transposition_table import SharedTranspositionTable
+
+_worker_table = None  # The SharedTranspositionTable of a worker process, attached by attach_table()
+
+
+class WorkerResult:
+    def __init__(self, worker, best_move, score, pv, nodes, elapsed, num_moves):
+        self.worker = worker
+        self.best_move = best_move  # Move.to_int() value
+        self.score = score
+        self.pv = pv  # Move.to_int() values, starting with best_move
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.num_moves = num_moves
+
+    def get_nodes_per_second(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+
+class ParallelSearchResult:
+    def __init__(self, best_move, score, pv, worker_results, elapsed):
+        self.best_move = best_move
+        self.score = score
+        self.pv = pv
+        self.worker_results = worker_results
+        self.elapsed = elapsed
+
+    def get_nodes(self):
+        return sum(worker_result.nodes for worker_result in self.worker_results)
+
+    def get_nodes_per_second(self):
+        return int(self.get_nodes() / self.elapsed) if self.elapsed > 0 else 0
+
+
+def attach_table(name, size_mb):
+    """Worker initializer, attaches the process to the table made by the parent."""
+    global _worker_table
+    _worker_table = SharedTranspositionTable(size_mb, name) if name is not None else None
+
+
+def search_root_moves(worker, fen, backend, move_values, depth):
+    """
+    Searches the root moves given, as Move.to_int() values, depth plies deep in a worker process.
+    Later moves are searched with the best score so far as alpha, since only a better move matters.
+    """
+    start_time = time.perf_counter()
+    engine = new_engine(fen, backend)
+    searcher = Searcher(engine, _worker_table)
+    best_move = None
+    best_score = -INFINITY
+    best_pv = []
+    for move_value in move_values:
+        move = Move.from_int(move_value)
+        child_pv = []
+        engine.make_move(move)
+        score = -searcher.negamax(depth - 1, -INFINITY, -best_score, 1, child_pv)
+        engine.unmake_move()
+        if best_move is None or score > best_score:
+            best_move, best_score = move, score
+            best_pv = [move] + child_pv
+    elapsed = time.perf_counter() - start_time
+    return WorkerResult(worker, best_move.to_int(), best_score, [move.to_int() for move in best_pv],
+                        searcher.nodes, elapsed, len(move_values))
+
+
+def split_moves(moves, num_workers):
+    """Deals moves out round robin, so the first, most promising, moves go to different workers."""
+    return [moves[worker::num_workers] for worker in range(num_workers) if moves[worker::num_workers]]
+
+
+def parallel_search(engine, depth, num_workers, table_mb=64):
+    """
+    Searches the position of engine depth plies deep with its root moves split across num_workers processes.
+
+    :param table_mb: size of the shared transposition table, 0 for none.
+    :return: ParallelSearchResult, with a best_move of None if there are no legal moves.
+    """
+    start_time = time.perf_counter()
+    moves = engine.generate_ordered_moves(engine.color_to_move)
+    if not moves:
+        score = -MATE_SCORE if engine.is_in_check(engine.color_to_move) else 0
+        return ParallelSearchResult(None, score, [], [], 0.0)
+
+    table = SharedTranspositionTable(table_mb) if table_mb else None
+    fen = to_fen(engine)
+    shares = split_moves([move.to_int() for move in moves], num_workers)
+    try:
+        with ProcessPoolExecutor(len(shares), initializer=attach_table,
+                                 initargs=(table.name if table is not None else None, table_mb)) as executor:
+            futures = [executor.submit(search_root_moves, worker, fen, engine.backend, share, depth)
+                       for worker, share in enumerate(shares)]
+            worker_results = [future.result() for future in futures]
+    finally:
+        if table is not None:
+            table.close()
+
+    best_result = max(worker_results, key=lambda worker_result: worker_result.score)
+    elapsed = time.perf_counter() - start_time
+    return ParallelSearchResult(Move.from_int(best_result.best_move), best_result.score,
+                                [Move.from_int(move_value) for move_value in best_result.pv],
+                                worker_results, elapsed)
+
+
+def print_result(result):
+    for worker_result in result.worker_results:
+        print(f'worker {worker_result.worker}: {worker_result.num_moves} moves, {worker_result.nodes} nodes '
+              f'in {worker_result.elapsed:.3f}s ({worker_result.get_nodes_per_second()} nodes/s), '
+              f'best {Move.from_int(worker_result.best_move)} score {worker_result.score}')
+    print(f'bestmove {result.best_move} score {result.score} pv {" ".join(str(move) for move in result.pv)}')
+    print(f'{result.get_nodes()} nodes in {result.elapsed:.3f}s ({result.get_nodes_per_second()} nodes/s)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search a chess position with its root moves split across processes.')
+    parser.add_argument('--fen', default=START_FEN, help='position to search, defaults to the start position')
+    parser.add_argument('--depth', type=int, default=4, help='plies to search')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes to search with')
+    parser.add_argument('--hash', type=float, default=64, help='MB of shared transposition table, 0 for none')
+    parser.add_argument('--backend', choices=BACKENDS, default=OBJECT_BACKEND,
+                        help='board representation to generate moves with')
+    parser.add_argument('--speedup', action='store_true', help='also search with 1 worker and compare the times')
+    args = parser.parse_args(argv)
+
+    engine = new_engine(args.fen, args.backend)
+    result = parallel_search(engine, args.depth, args.workers, args.hash)
+    print_result(result)
+    if args.speedup:
+        print('\n1 worker:')
+        single_result = parallel_search(engine, args.depth, 1, args.hash)
+        print_result(single_result)
+        speedup = single_result.elapsed / result.elapsed if result.elapsed > 0 else 0.0
+        print(f'\nSpeedup with {args.workers} workers: {speedup:.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Counts the leaf nodes of the legal move tree to a fixed depth.
+
+Perft numbers are known for many positions, so they check move generation for correctness
+while the node rate measures its speed.
+
+Usage:
+    python perft.py --depth 3
+    python perft.py --fen "<fen>" --depth 2 --divide
+    python perft.py --suite --max-nodes 100000
+    python perft.py --suite --backend bitboard
+    python perft.py --depth 5 --hash 64
+"""
+import argparse
+import sys
+import time
+
+from constants import *
+from fen import START_FEN
+from model import GameEngine
+from transposition_table import EXACT, TranspositionTable
+
+# (name, FEN, node counts for depth 1, 2, ...)
+REFERENCE_POSITIONS = [
+    ('start position',
+     START_FEN,
+     [20, 400, 8902, 197281, 4865609]),
+    ('kiwipete',
+     'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603]),
+    ('rook endgame with en passant pins',
+     '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624]),
+    ('promotions and castling through check',
+     'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333]),
+    ('promotion with check',
+     'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487]),
+    ('middlegame',
+     'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def new_engine(fen=START_FEN, backend=OBJECT_BACKEND, debug=False):
+    return GameEngine.from_fen(fen, backend=backend, debug=debug)
+
+
+def new_position(fen=START_FEN, backend=OBJECT_BACKEND):
+    """
+    The object perft runs on. With the bitboard backend that is the BitboardPosition itself,
+    so the count never leaves the bitboards.
+    """
+    engine = new_engine(fen, backend)
+    return engine.bitboard_position if backend == BITBOARD_BACKEND else engine
+
+
+def perft(position, depth, table=None):
+    """
+    Number of leaf nodes depth plies below position, a GameEngine or a BitboardPosition.
+
+    table: optional TranspositionTable caching the counts of subtrees by position hash,
+           so transpositions are only counted once. Needs a GameEngine position.
+    """
+    if depth == 0:
+        return 1
+    if table is not None and depth > 1:
+        entry = table.probe(position.zobrist_key)
+        if entry is not None and entry[0] == depth:
+            return entry[1]
+
+    legal_moves = position.generate_legal_moves(position.color_to_move)
+    if depth == 1:
+        return len(legal_moves)
+
+    nodes = 0
+    for move in legal_moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1, table)
+        position.unmake_move()
+
+    if table is not None:
+        table.store(position.zobrist_key, depth, nodes, EXACT)
+    return nodes
+
+
+def divide(position, depth, table=None):
+    """
+    Perft split by root move, returned as a list of (move, nodes).
+    Comparing it against another move generator narrows a wrong count down to a single move.
+    """
+    counts = []
+    for move in position.generate_legal_moves(position.color_to_move):
+        position.make_move(move)
+        counts.append((move, perft(position, depth - 1, table)))
+        position.unmake_move()
+    return counts
+
+
+def timed_perft(position, depth, table=None):
+    start_time = time.perf_counter()
+    nodes = perft(position, depth, table)
+    elapsed = time.perf_counter() - start_time
+    return nodes, elapsed
+
+
+def nodes_per_second(nodes, elapsed):
+    return int(nodes / elapsed) if elapsed > 0 else 0
+
+
+def run_divide(fen, depth, backend, table):
+    position = new_position(fen, backend)
+    start_time = time.perf_counter()
+    counts = divide(position, depth, table)
+    elapsed = time.perf_counter() - start_time
+    if backend == BITBOARD_BACKEND:
+        counts = [(position.to_move(move), nodes) for move, nodes in counts]
+
+    for move, nodes in sorted(counts, key=lambda count: str(count[0])):
+        print(f'{move}: {nodes}')
+    total = sum(nodes for _, nodes in counts)
+    print(f'\nMoves: {len(counts)}')
+    print(f'Nodes: {total}')
+    print(f'Time: {elapsed:.3f}s ({nodes_per_second(total, elapsed)} nodes/s)')
+
+
+def run_perft(fen, depth, backend, table):
+    position = new_position(fen, backend)
+    for current_depth in range(1, depth + 1):
+        nodes, elapsed = timed_perft(position, current_depth, table)
+        print(f'depth {current_depth}: {nodes} nodes in {elapsed:.3f}s ({nodes_per_second(nodes, elapsed)} nodes/s)')
+
+
+def run_suite(max_nodes, backend, table):
+    """
+    Checks every reference position at each depth whose node count is at most max_nodes.
+    Returns True if all counts match.
+    """
+    all_passed = True
+    total_nodes = 0
+    total_elapsed = 0.0
+    for name, fen, expected_counts in REFERENCE_POSITIONS:
+        position = new_position(fen, backend)
+        for depth, expected_nodes in enumerate(expected_counts, start=1):
+            if expected_nodes > max_nodes:
+                break
+            nodes, elapsed = timed_perft(position, depth, table)
+            total_nodes += nodes
+            total_elapsed += elapsed
+
+            passed = nodes == expected_nodes
+            all_passed = all_passed and passed
+            status = 'ok' if passed else f'FAIL (expected {expected_nodes})'
+            print(f'{name}, depth {depth}: {nodes} nodes in {elapsed:.3f}s '
+                  f'({nodes_per_second(nodes, elapsed)} nodes/s) {status}')
+
+    print(f'\nTotal: {total_nodes} nodes in {total_elapsed:.3f}s '
+          f'({nodes_per_second(total_nodes, total_elapsed)} nodes/s)')
+    return all_passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count the legal move tree of a chess position.')
+    parser.add_argument('--fen', default=START_FEN, help='position to search, defaults to the start position')
+    parser.add_argument('--depth', type=int, default=3, help='number of plies to search')
+    parser.add_argument('--divide', action='store_true', help='print the node count below each root move')
+    parser.add_argument('--suite', action='store_true', help='check the reference positions')
+    parser.add_argument('--max-nodes', type=int, default=100000,
+                        help='largest reference count the suite checks (default: 100000)')
+    parser.add_argument('--backend', choices=BACKENDS, default=OBJECT_BACKEND,
+                        help='board representation to generate moves with')
+    parser.add_argument('--hash', type=float, default=0,
+                        help='MB of transposition table to cache subtree counts in (objects backend only)')
+    args = parser.parse_args(argv)
+    if args.hash and args.backend == BITBOARD_BACKEND:
+        parser.error('--hash needs the position hash kept by the objects backend')
+    table = TranspositionTable(args.hash) if args.hash else None
+
+    if args.suite:
+        passed = run_suite(args.max_nodes, args.backend, table)
+    elif args.divide:
+        passed = True
+        run_divide(args.fen, args.depth, args.backend, table)
+    else:
+        passed = True
+        run_perft(args.fen, args.depth, args.backend, table)
+
+    if table is not None:
+        print(f'Hash: {table}')
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
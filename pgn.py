@@ -0,0 +1,313 @@
+"""
+Reads and writes games in Portable Game Notation.
+
+read_games() streams the games of a file one at a time, holding only the game being read, so archives of
+any size replay in constant memory. A PgnGame keeps its moves as SAN text until replay() resolves them
+one by one against the legal moves of a GameEngine. write_game() turns GameEngine.move_log back into SAN.
+
+Usage:
+    python pgn.py games.pgn
+    python pgn.py --generate 200 --write random.pgn
+"""
+import argparse
+import random
+import re
+import sys
+import time
+
+from constants import *
+from fen import START_FEN, load_fen, to_fen
+from model import GameEngine
+from move import FILE_NAMES, PROMOTION_LETTERS, Move, decode_move, square_name
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+DEFAULT_TAGS = {'Event': '?', 'Site': '?', 'Date': '????.??.??', 'Round': '?', 'White': '?', 'Black': '?'}
+MAX_LINE_LENGTH = 80
+
+SAN_PIECE_LETTERS = [None, '', 'N', 'B', 'R', 'Q', 'K']
+SAN_PIECE_TYPES = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+SAN_RE = re.compile(r'([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?')
+TAG_RE = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# Comments, variation brackets, NAGs, move numbers and everything else, which is SAN or a result
+TOKEN_RE = re.compile(r'\{[^}]*\}|;[^\n]*|[()]|\$\d+|\d+\.+|[^\s(){};$]+')
+
+
+class PgnGame:
+    def __init__(self, tags, sans, result):
+        self.tags = tags  # Tag name: value, in file order
+        self.sans = sans  # Moves of the main line in SAN, without annotations
+        self.result = result
+
+    def get_start_fen(self):
+        return self.tags['FEN'] if self.tags.get('SetUp', '1') == '1' and 'FEN' in self.tags else START_FEN
+
+    def replay(self, engine=None, backend=OBJECT_BACKEND):
+        """
+        Plays the moves of the game, yielding each Move once it is on the board.
+        The engine is set up at the start of the game and moved along, so read it between moves to see
+        the positions. Raises ValueError at the first move that isn't legal.
+
+        :param engine: a GameEngine to reuse, None for a new one.
+        """
+        fen = self.get_start_fen()
+        if engine is None:
+            engine = GameEngine.from_fen(fen, backend=backend)
+        else:
+            load_fen(engine, fen)
+        for san in self.sans:
+            move = parse_san(engine, san)
+            engine.play_move(move)
+            yield move
+
+
+def parse_san(engine, san):
+    """
+    The legal Move of the side to move in engine that san describes. Check, mate and annotation
+    suffixes are ignored. Raises ValueError if no legal move, or more than one, matches.
+
+    Only the pieces SAN names are tried, instead of generating every legal move of the position.
+    """
+    color = engine.color_to_move
+    text = san.rstrip('+#!?')
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        king = engine.get_king(color)
+        end_column = king.column + (2 if len(text) == 3 else -2)
+        checks, _ = king.get_checks_and_pins(engine.board)
+        candidates = [move for move in engine.generate_legal_king_moves(king, checks)
+                      if (move.end_row, move.end_column) == (king.row, end_column)]
+    else:
+        match = SAN_RE.fullmatch(text)
+        if match is None:
+            raise ValueError(f'not a SAN move: {san}')
+        piece_letter, from_file, from_rank, capture_marker, target, promotion_letter = match.groups()
+        piece_type = SAN_PIECE_TYPES[piece_letter] if piece_letter else PAWN
+        end_row, end_column = 8 - int(target[1]), FILE_NAMES.index(target[0])
+        promotion = SAN_PIECE_TYPES[promotion_letter] if promotion_letter else None
+        if (piece_type == PAWN and end_row in (0, 7)) != (promotion is not None):
+            raise ValueError(f'promotion must be given exactly for pawns reaching the last rank: {san}')
+        rows = range(8) if from_rank is None else (8 - int(from_rank),)
+        columns = range(8) if from_file is None else (FILE_NAMES.index(from_file),)
+        if piece_type == PAWN:
+            # A pawn only changes file when it captures, and its capture names the file it comes from
+            if capture_marker is None:
+                columns = [column for column in columns if column == end_column]
+            elif from_file is None:
+                raise ValueError(f'pawn capture without the file it comes from: {san}')
+            else:
+                columns = [column for column in columns if column != end_column]
+        candidates = []
+        for row in rows:
+            for column in columns:
+                piece = engine.board[row][column]
+                if (piece.TYPE == piece_type and piece.COLOR == color
+                        and (end_row, end_column) in engine.get_pseudo_legal_moves(piece)):
+                    move = Move(row, column, end_row, end_column, promotion)
+                    if engine.is_legal_move(move):
+                        candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError(f'{"ambiguous" if candidates else "illegal"} move {san} in {to_fen(engine)}')
+    return candidates[0]
+
+
+def to_san(engine, move, legal_moves=None):
+    """
+    SAN of a legal move of the side to move in engine, with + or # if it checks or mates.
+    :param legal_moves: the legal moves of the position, if already generated.
+    """
+    if legal_moves is None:
+        legal_moves = engine.generate_legal_moves(engine.color_to_move)
+    piece = engine.board[move.start_row][move.start_column]
+    target = engine.board[move.end_row][move.end_column]
+    if piece.TYPE == KING and abs(move.end_column - move.start_column) == 2:
+        san = 'O-O' if move.end_column > move.start_column else 'O-O-O'
+    else:
+        is_capture = target.TYPE != BLANK or (piece.TYPE == PAWN and move.start_column != move.end_column)
+        if piece.TYPE == PAWN:
+            san = FILE_NAMES[move.start_column] + 'x' if is_capture else ''
+        else:
+            san = SAN_PIECE_LETTERS[piece.TYPE] + get_disambiguation(engine, move, piece.TYPE, legal_moves)
+            if is_capture:
+                san += 'x'
+        san += square_name(move.end_row, move.end_column)
+        if move.promotion is not None:
+            san += '=' + PROMOTION_LETTERS[move.promotion].upper()
+
+    engine.make_move(move)
+    if engine.is_in_check(engine.color_to_move):
+        san += '+' if engine.generate_legal_moves(engine.color_to_move) else '#'
+    engine.unmake_move()
+    return san
+
+
+def get_disambiguation(engine, move, piece_type, legal_moves):
+    """The start file, rank or square SAN needs to tell move apart from moves of other pieces of its type."""
+    rivals = [other for other in legal_moves
+              if (other.end_row, other.end_column) == (move.end_row, move.end_column)
+              and (other.start_row, other.start_column) != (move.start_row, move.start_column)
+              and engine.board[other.start_row][other.start_column].TYPE == piece_type]
+    if not rivals:
+        return ''
+    if all(other.start_column != move.start_column for other in rivals):
+        return FILE_NAMES[move.start_column]
+    if all(other.start_row != move.start_row for other in rivals):
+        return str(8 - move.start_row)
+    return square_name(move.start_row, move.start_column)
+
+
+def parse_movetext(movetext):
+    """:return: (SAN moves of the main line, result), skipping comments, NAGs and variations."""
+    sans = []
+    result = '*'
+    variation_depth = 0
+    for token in TOKEN_RE.findall(movetext):
+        if token == '(':
+            variation_depth += 1
+        elif token == ')':
+            variation_depth -= 1
+        elif variation_depth or token[0] in '{;$' or token[0].isdigit() and token[-1] == '.':
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            sans.append(token)
+    return sans, result
+
+
+def read_games(lines):
+    """
+    Yields each game of a PGN file as a PgnGame, reading lines only as the games are needed.
+    :param lines: an open file, or any iterable of lines.
+    """
+    tags = {}
+    movetext = []
+    for line in lines:
+        if line.startswith('%'):
+            continue  # Escaped line
+        if line.startswith('['):
+            if movetext:  # Tags after move text start the next game
+                yield PgnGame(tags, *parse_movetext(''.join(movetext)))
+                tags = {}
+                movetext = []
+            match = TAG_RE.match(line)
+            if match is not None:
+                tags[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+        elif line.strip() or movetext:
+            movetext.append(line)
+    if tags or ''.join(movetext).strip():
+        yield PgnGame(tags, *parse_movetext(''.join(movetext)))
+
+
+def get_sans(engine):
+    """SAN of every move in engine.move_log, replayed from the position the log starts at."""
+    replay_engine = GameEngine.from_fen(engine.start_fen)
+    sans = []
+    for value in engine.move_log:
+        move, _ = decode_move(value)
+        sans.append(to_san(replay_engine, move))
+        replay_engine.play_move(move)
+    return sans
+
+
+def write_game(out, engine, tags=None, result='*'):
+    """
+    Writes the moves of engine.move_log as a PGN game to the text stream out.
+    :param tags: tag name: value, filled in with the Seven Tag Roster and, for games that don't begin at
+                 the start position, SetUp and FEN.
+    """
+    tags = {**DEFAULT_TAGS, **(tags or {}), 'Result': result}
+    if engine.start_fen != START_FEN:
+        tags['SetUp'] = '1'
+        tags['FEN'] = engine.start_fen
+    names = list(SEVEN_TAG_ROSTER) + [name for name in tags if name not in SEVEN_TAG_ROSTER]
+    for name in names:
+        value = tags[name].replace('\\', '\\\\').replace('"', '\\"')
+        out.write(f'[{name} "{value}"]\n')
+    out.write('\n')
+
+    start_fields = engine.start_fen.split()
+    color = WHITE if start_fields[1] == 'w' else BLACK
+    move_number = int(start_fields[5]) if len(start_fields) == 6 else 1
+    words = []
+    for index, san in enumerate(get_sans(engine)):
+        if color == WHITE:
+            words.append(f'{move_number}. {san}')
+        else:
+            words.append(f'{move_number}... {san}' if index == 0 else san)
+            move_number += 1
+        color = not color
+    words.append(result)
+
+    line = ''
+    for word in words:
+        if line and len(line) + 1 + len(word) > MAX_LINE_LENGTH:
+            out.write(line + '\n')
+            line = word
+        else:
+            line = f'{line} {word}' if line else word
+    out.write(line + '\n\n')
+
+
+def generate_random_game(rng, max_plies=200):
+    """A GameEngine that played random legal moves until the game ended or max_plies, and its result."""
+    engine = GameEngine.from_fen(START_FEN)
+    for _ in range(max_plies):
+        moves = engine.generate_legal_moves(engine.color_to_move)
+        if not moves:
+            if not engine.is_in_check(engine.color_to_move):
+                return engine, '1/2-1/2'
+            return engine, '0-1' if engine.color_to_move == WHITE else '1-0'
+        engine.play_move(rng.choice(moves))
+    return engine, '*'
+
+
+def benchmark(lines, backend=OBJECT_BACKEND):
+    """
+    Replays every game of lines.
+    :return: (games, plies, seconds, games with an illegal move)
+    """
+    engine = GameEngine.from_fen(START_FEN, backend=backend)
+    num_games = num_plies = num_errors = 0
+    start_time = time.perf_counter()
+    for game in read_games(lines):
+        num_games += 1
+        try:
+            for _ in game.replay(engine):
+                num_plies += 1
+        except ValueError as error:
+            num_errors += 1
+            print(f'game {num_games}: {error}', file=sys.stderr)
+    return num_games, num_plies, time.perf_counter() - start_time, num_errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay the games of a PGN file and report the throughput.')
+    parser.add_argument('path', nargs='?', help='PGN file to replay')
+    parser.add_argument('--generate', type=int, default=0, metavar='GAMES',
+                        help='write this many games of random moves first, and replay them if no path is given')
+    parser.add_argument('--write', default='random.pgn', help='where --generate writes its games')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random games')
+    parser.add_argument('--backend', choices=BACKENDS, default=OBJECT_BACKEND,
+                        help='board representation to generate moves with')
+    args = parser.parse_args(argv)
+    if args.path is None and not args.generate:
+        parser.error('give a PGN file or --generate')
+
+    if args.generate:
+        rng = random.Random(args.seed)
+        start_time = time.perf_counter()
+        with open(args.write, 'w') as out:
+            for round_number in range(1, args.generate + 1):
+                engine, result = generate_random_game(rng)
+                write_game(out, engine, {'Event': 'Random moves', 'Round': str(round_number)}, result)
+        print(f'Wrote {args.generate} games to {args.write} in {time.perf_counter() - start_time:.2f}s')
+
+    with open(args.path or args.write) as lines:
+        num_games, num_plies, elapsed, num_errors = benchmark(lines, args.backend)
+    print(f'{num_games} games, {num_plies} plies in {elapsed:.2f}s: {num_games / elapsed:.1f} games/s, '
+          f'{num_plies / elapsed:.0f} plies/s, {num_errors} games with an illegal move')
+    return 1 if num_errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,12 @@
 from constants import *
-
-
-def on_the_board(row, column):
-    return 0 <= row < 8 and 0 <= column < 8
+from lookup_tables import *
 
 
 class Piece:
+    """
+    A piece on a square of the board. Slotted, so each costs a few words instead of an instance __dict__.
+    """
+    __slots__ = ('COLOR', 'row', 'column', 'is_selected')
     TYPE = -1
 
     def __init__(self, color, row=-1, column=-1):
@@ -21,13 +22,57 @@ class Piece:
     def get_pseudo_legal_moves(self, board):
         pass
 
+    def get_pseudo_legal_captures(self, board):
+        """The subset of get_pseudo_legal_moves() that captures or promotes."""
+        pass
+
+
+def get_step_moves(piece, board, targets):
+    moves = set()
+    for end_row, end_column in targets:
+        if board[end_row][end_column].COLOR != piece.COLOR:
+            moves.add((end_row, end_column))
+    return moves
+
+
+def get_sliding_moves(piece, board, rays):
+    moves = set()
+    for ray in rays:
+        for end_row, end_column in ray:
+            end_piece = board[end_row][end_column]
+            if end_piece.COLOR != piece.COLOR:  # Blank or a piece of the opposite color
+                moves.add((end_row, end_column))
+            if end_piece.TYPE != BLANK:
+                break
+    return moves
+
+
+def get_step_captures(piece, board, targets):
+    captures = set()
+    opposite_color = not piece.COLOR
+    for end_row, end_column in targets:
+        if board[end_row][end_column].COLOR == opposite_color:
+            captures.add((end_row, end_column))
+    return captures
+
+
+def get_sliding_captures(piece, board, rays):
+    captures = set()
+    opposite_color = not piece.COLOR
+    for ray in rays:
+        for end_row, end_column in ray:
+            end_piece = board[end_row][end_column]
+            if end_piece.TYPE != BLANK:
+                if end_piece.COLOR == opposite_color:
+                    captures.add((end_row, end_column))
+                break
+    return captures
+
 
 class Pawn(Piece):
+    __slots__ = ()
     TYPE = PAWN
 
-    def __init__(self, color, row=-1, column=-1):
-        super().__init__(color, row, column)
-
     def get_pseudo_legal_moves(self, board):
         moves = set()
         if self.COLOR == WHITE:
@@ -39,6 +84,19 @@ class Pawn(Piece):
 
         return moves
 
+    def get_pseudo_legal_captures(self, board):
+        moves = set()
+        if self.COLOR == WHITE:
+            if self.row == 1 and board[0][self.column].TYPE == BLANK:  # Promotion
+                moves.add((0, self.column))
+            self._check_captures_white(board, moves)
+        elif self.COLOR == BLACK:
+            if self.row == 6 and board[7][self.column].TYPE == BLANK:  # Promotion
+                moves.add((7, self.column))
+            self._check_captures_black(board, moves)
+
+        return moves
+
     def _check_forward_moves_white(self, board, moves):
         if board[self.row - 1][self.column].TYPE == BLANK:  # One square
             moves.add((self.row - 1, self.column))
@@ -54,147 +112,90 @@ class Pawn(Piece):
                 moves.add((self.row + 2, self.column))
 
     def _check_captures_white(self, board, moves):
-        if self.column > 0:  # Left captures, not on edge of the board
-            left_diagonal_piece = board[self.row - 1][self.column - 1]
-            if left_diagonal_piece.TYPE != BLANK and left_diagonal_piece.COLOR == BLACK:
-                moves.add((left_diagonal_piece.row, left_diagonal_piece.column))
-        if self.column < len(board) - 1:  # Right captures
-            right_diagonal_piece = board[self.row - 1][self.column + 1]
-            if right_diagonal_piece.TYPE != BLANK and right_diagonal_piece.COLOR == BLACK:
-                moves.add((right_diagonal_piece.row, right_diagonal_piece.column))
+        for end_row, end_column in PAWN_CAPTURES[WHITE][self.row][self.column]:
+            diagonal_piece = board[end_row][end_column]
+            if diagonal_piece.TYPE != BLANK and diagonal_piece.COLOR == BLACK:
+                moves.add((end_row, end_column))
 
     def _check_captures_black(self, board, moves):
-        if self.column > 0:  # Left captures
-            left_diagonal_piece = board[self.row + 1][self.column - 1]
-            if left_diagonal_piece.TYPE != BLANK and left_diagonal_piece.COLOR == WHITE:
-                moves.add((left_diagonal_piece.row, left_diagonal_piece.column))
-        if self.column < len(board) - 1:  # Right captures
-            right_diagonal_piece = board[self.row + 1][self.column + 1]
-            if right_diagonal_piece.TYPE != BLANK and right_diagonal_piece.COLOR == WHITE:
-                moves.add((right_diagonal_piece.row, right_diagonal_piece.column))
+        for end_row, end_column in PAWN_CAPTURES[BLACK][self.row][self.column]:
+            diagonal_piece = board[end_row][end_column]
+            if diagonal_piece.TYPE != BLANK and diagonal_piece.COLOR == WHITE:
+                moves.add((end_row, end_column))
 
     def should_promote(self):
         should_promote = False
 
-        if (self.COLOR == WHITE and self.row == 0) or (self.COLOR == BLACK and self.row == 8):
+        if (self.COLOR == WHITE and self.row == 0) or (self.COLOR == BLACK and self.row == 7):
             should_promote = True
 
         return should_promote
 
-    def transform_to_queen(self):
-        queen = Queen(self.COLOR, self.row, self.column)
-        return queen
+    def transform_to(self, piece_type=QUEEN):
+        promoted_piece = PROMOTION_PIECES[piece_type](self.COLOR, self.row, self.column)
+        return promoted_piece
 
     def moved_two_squares(self, blank_piece_row):
         return abs(self.row - blank_piece_row) == 2
 
     def update_pseudo_legal_moves_for_en_passant_white(self, pseudo_legal_moves, board, en_passant_move):
-        left_diagonal_square = (self.row - 1, self.column - 1) if self.column > 0 else ()
-        right_diagonal_square = (self.row - 1, self.column + 1) if self.column < len(board) - 1 else ()
-        if en_passant_move in {left_diagonal_square, right_diagonal_square}:
+        if en_passant_move in PAWN_CAPTURES[WHITE][self.row][self.column]:
             pseudo_legal_moves.add(en_passant_move)
 
         return pseudo_legal_moves
 
     def update_pseudo_legal_moves_for_en_passant_black(self, pseudo_legal_moves, board, en_passant_move):
-        left_diagonal_square = (self.row + 1, self.column - 1) if self.column > 0 else ()
-        right_diagonal_square = (self.row + 1, self.column + 1) if self.column < len(board) - 1 else ()
-        if en_passant_move in {left_diagonal_square, right_diagonal_square}:
+        if en_passant_move in PAWN_CAPTURES[BLACK][self.row][self.column]:
             pseudo_legal_moves.add(en_passant_move)
 
         return pseudo_legal_moves
 
 
 class Knight(Piece):
+    __slots__ = ()
     TYPE = KNIGHT
 
-    def __init__(self, color, row=-1, column=-1):
-        super().__init__(color, row, column)
-
     def get_pseudo_legal_moves(self, board):
-        moves = set()
-        directions = [(-1, -2), (-1, 2), (1, -2), (1, 2), (-2, -1), (-2, 1), (2, -1), (2, 1)]
+        return get_step_moves(self, board, KNIGHT_TARGETS[self.row][self.column])
 
-        for direction in directions:
-            end_row = self.row + direction[0]
-            end_column = self.column + direction[1]
-            if on_the_board(end_row, end_column):
-                end_piece = board[end_row][end_column]
-                if end_piece.COLOR != self.COLOR:
-                    moves.add((end_piece.row, end_piece.column))
-        return moves
+    def get_pseudo_legal_captures(self, board):
+        return get_step_captures(self, board, KNIGHT_TARGETS[self.row][self.column])
 
 
 class Bishop(Piece):
+    __slots__ = ()
     TYPE = BISHOP
 
-    def __init__(self, color, row=-1, column=-1):
-        super().__init__(color, row, column)
-
     def get_pseudo_legal_moves(self, board):
-        moves = set()
-
-        directions = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
-        opposite_color = not self.COLOR
+        return get_sliding_moves(self, board, DIAGONAL_RAYS[self.row][self.column])
 
-        for direction in directions:
-            for num_squares_moved in range(1, len(board)):
-                end_row = self.row + direction[0] * num_squares_moved
-                end_column = self.column + direction[1] * num_squares_moved
-                if on_the_board(end_row, end_column):
-                    end_piece = board[end_row][end_column]
-                    if end_piece.TYPE == BLANK:
-                        moves.add((end_piece.row, end_piece.column))
-                    elif end_piece.COLOR == opposite_color:
-                        moves.add((end_piece.row, end_piece.column))
-                        break
-                    elif end_piece.COLOR == self.COLOR:
-                        break
-                else:  # The square is off the board
-                    break
-        return moves
+    def get_pseudo_legal_captures(self, board):
+        return get_sliding_captures(self, board, DIAGONAL_RAYS[self.row][self.column])
 
 
 class Rook(Piece):
+    __slots__ = ()
     TYPE = ROOK
 
-    def __init__(self, color, row=-1, column=-1):
-        super().__init__(color, row, column)
-
     def get_pseudo_legal_moves(self, board):
-        moves = set()
+        return get_sliding_moves(self, board, CARDINAL_RAYS[self.row][self.column])
 
-        directions = [(-1, 0), (0, -1), (1, 0), (0, 1)]
-        opposite_color = not self.COLOR
-
-        for direction in directions:
-            for num_squares_moved in range(1, len(board)):
-                end_row = self.row + direction[0] * num_squares_moved
-                end_column = self.column + direction[1] * num_squares_moved
-                if on_the_board(end_row, end_column):
-                    end_piece = board[end_row][end_column]
-                    if end_piece.TYPE == BLANK:
-                        moves.add((end_piece.row, end_piece.column))
-                    elif end_piece.COLOR == opposite_color:
-                        moves.add((end_piece.row, end_piece.column))
-                        break
-                    elif end_piece.COLOR == self.COLOR:
-                        break
-                else:  # The square is off the board
-                    break
-        return moves
+    def get_pseudo_legal_captures(self, board):
+        return get_sliding_captures(self, board, CARDINAL_RAYS[self.row][self.column])
 
 
 class Queen(Piece):
+    __slots__ = ()
     TYPE = QUEEN
 
-    def __init__(self, color, row=-1, column=-1):
-        super().__init__(color, row, column)
-
     def get_pseudo_legal_moves(self, board):
-        rook = Rook(self.COLOR, self.row, self.column)
-        bishop = Bishop(self.COLOR, self.row, self.column)
-        return set.union(rook.get_pseudo_legal_moves(board), bishop.get_pseudo_legal_moves(board))
+        return get_sliding_moves(self, board, QUEEN_RAYS[self.row][self.column])
+
+    def get_pseudo_legal_captures(self, board):
+        return get_sliding_captures(self, board, QUEEN_RAYS[self.row][self.column])
+
+
+PROMOTION_PIECES = {KNIGHT: Knight, BISHOP: Bishop, ROOK: Rook, QUEEN: Queen}
 
 
 def is_cardinal_piece(piece):
@@ -205,18 +206,74 @@ def in_range_of_king(end_piece, num_squares_away):
     return num_squares_away == 1 and end_piece.TYPE == KING
 
 
-def in_range_of_pawn(end_piece, num_squares_away, direction):
-    if end_piece.COLOR == WHITE:
-        return num_squares_away == 1 and end_piece.TYPE == PAWN and direction in {(1, -1), (1, 1)}
-    elif end_piece.COLOR == BLACK:
-        return num_squares_away == 1 and end_piece.TYPE == PAWN and direction in {(-1, -1), (-1, 1)}
+def in_range_of_pawn(end_piece, num_squares_away, row, column):
+    """True if end_piece is a pawn capturing onto (row, column)."""
+    return (num_squares_away == 1 and end_piece.TYPE == PAWN
+            and (row, column) in PAWN_CAPTURES[end_piece.COLOR][end_piece.row][end_piece.column])
 
 
 def is_diagonal_piece(piece):
     return piece.TYPE in {BISHOP, QUEEN}
 
 
+def is_attacked_from_cardinal_directions(board, row, column, color, ignored_piece=None):
+    opposite_color = not color
+    for ray in CARDINAL_RAYS[row][column]:
+        for num_squares_away, (end_row, end_column) in enumerate(ray, start=1):
+            end_piece = board[end_row][end_column]
+            if end_piece is ignored_piece:
+                continue
+            if end_piece.COLOR == color:
+                break
+            elif end_piece.COLOR == opposite_color:
+                if in_range_of_king(end_piece, num_squares_away) or is_cardinal_piece(end_piece):
+                    return True
+                # if a enemy piece that doesn't check the king is found, stop looking in this direction
+                break
+    return False
+
+
+def is_attacked_from_diagonal_directions(board, row, column, color, ignored_piece=None):
+    opposite_color = not color
+    for ray in DIAGONAL_RAYS[row][column]:
+        for num_squares_away, (end_row, end_column) in enumerate(ray, start=1):
+            end_piece = board[end_row][end_column]
+            if end_piece is ignored_piece:
+                continue
+            if end_piece.COLOR == color:
+                break
+            elif end_piece.COLOR == opposite_color:
+                if (in_range_of_king(end_piece, num_squares_away)
+                        or in_range_of_pawn(end_piece, num_squares_away, row, column)
+                        or is_diagonal_piece(end_piece)):
+                    return True
+                # if a enemy piece that doesn't check the king is found, stop looking in this direction
+                break
+    return False
+
+
+def is_attacked_by_knights(board, row, column, color):
+    opposite_color = not color
+
+    for end_row, end_column in KNIGHT_TARGETS[row][column]:
+        end_piece = board[end_row][end_column]
+        if end_piece.COLOR == opposite_color and end_piece.TYPE == KNIGHT:
+            return True
+    return False
+
+
+def is_square_attacked(board, row, column, color, ignored_piece=None):
+    """
+    True if a piece of the opposite color of color attacks the square.
+    ignored_piece is looked through as if it were blank, e.g. the king that is about to leave its square.
+    """
+    return (is_attacked_from_cardinal_directions(board, row, column, color, ignored_piece)
+            or is_attacked_from_diagonal_directions(board, row, column, color, ignored_piece)
+            or is_attacked_by_knights(board, row, column, color))
+
+
 class King(Piece):
+    __slots__ = ('in_check',)
     TYPE = KING
 
     def __init__(self, color, row=-1, column=-1):
@@ -224,79 +281,64 @@ class King(Piece):
         self.in_check = False
 
     def get_pseudo_legal_moves(self, board):
-        moves = set()
-        directions = [(-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+        return get_step_moves(self, board, KING_TARGETS[self.row][self.column])
 
-        for direction in directions:
-            end_row = self.row + direction[0]
-            end_column = self.column + direction[1]
-            if on_the_board(end_row, end_column):
-                end_piece = board[end_row][end_column]
-                if end_piece.COLOR != self.COLOR:
-                    moves.add((end_piece.row, end_piece.column))
-        return moves
+    def get_pseudo_legal_captures(self, board):
+        return get_step_captures(self, board, KING_TARGETS[self.row][self.column])
 
     def get_check_status(self, board):
-        in_check = False
-        cardinal_status = self._get_check_status_from_cardinal_directions(board)
-        diagonal_status = self._get_check_status_from_diagonal_directions(board)
-        knight_status = self._get_check_status_from_knights(board)
-
-        if any([cardinal_status, diagonal_status, knight_status]):
-            in_check = True
-
-        return in_check
+        # Stops at the first kind of attack found
+        return (self._get_check_status_from_cardinal_directions(board)
+                or self._get_check_status_from_diagonal_directions(board)
+                or self._get_check_status_from_knights(board))
 
     def _get_check_status_from_cardinal_directions(self, board):
-        directions = [(-1, 0), (0, -1), (1, 0), (0, 1)]
-        opposite_color = not self.COLOR
-        for direction in directions:
-            for num_squares_away in range(1, len(board)):
-                end_row = self.row + direction[0] * num_squares_away
-                end_column = self.column + direction[1] * num_squares_away
-                if on_the_board(end_row, end_column):
-                    end_piece = board[end_row][end_column]
-                    if end_piece.COLOR == self.COLOR:
-                        break
-                    elif end_piece.COLOR == opposite_color:
-                        if in_range_of_king(end_piece, num_squares_away) or is_cardinal_piece(end_piece):
-                            return True
-                        # if a enemy piece that doesn't check the king is found, stop looking in this direction
-                        break
-        return False
+        return is_attacked_from_cardinal_directions(board, self.row, self.column, self.COLOR)
 
     def _get_check_status_from_diagonal_directions(self, board):
-        directions = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
-        opposite_color = not self.COLOR
-        for direction in directions:
-            for num_squares_away in range(1, len(board)):
-                end_row = self.row + direction[0] * num_squares_away
-                end_column = self.column + direction[1] * num_squares_away
-                if on_the_board(end_row, end_column):
-                    end_piece = board[end_row][end_column]
-                    if end_piece.COLOR == self.COLOR:
-                        break
-                    elif end_piece.COLOR == opposite_color:
-                        if (in_range_of_king(end_piece, num_squares_away)
-                                or in_range_of_pawn(end_piece, num_squares_away, direction)
-                                or is_diagonal_piece(end_piece)):
-                            return True
-                        # if a enemy piece that doesn't check the king is found, stop looking in this direction
-                        break
-        return False
+        return is_attacked_from_diagonal_directions(board, self.row, self.column, self.COLOR)
 
     def _get_check_status_from_knights(self, board):
-        directions = [(-1, -2), (-1, 2), (1, -2), (1, 2), (-2, -1), (-2, 1), (2, -1), (2, 1)]
+        return is_attacked_by_knights(board, self.row, self.column, self.COLOR)
+
+    def get_checks_and_pins(self, board):
+        """
+        Walks outward from the king once.
+
+        Returns a list with one set of squares per checking piece (the checker and, for a sliding piece,
+        the squares between it and the king) and a dict mapping the square of each pinned friendly piece
+        to the squares it can move to without leaving the pin line.
+        The sets are shared frozensets from lookup_tables, so none is built per call.
+        """
+        checks = []
+        pins = {}
         opposite_color = not self.COLOR
-
-        for direction in directions:
-            end_row = self.row + direction[0]
-            end_column = self.column + direction[1]
-            if on_the_board(end_row, end_column):
+        for direction, squares, ray_prefixes in zip(ALL_DIRECTIONS, QUEEN_RAYS[self.row][self.column],
+                                                    QUEEN_RAY_PREFIXES[self.row][self.column]):
+            is_diagonal = direction[0] != 0 and direction[1] != 0
+            pinned_piece = None
+            for num_squares_away, (end_row, end_column) in enumerate(squares, start=1):
                 end_piece = board[end_row][end_column]
-                if end_piece.COLOR == opposite_color and end_piece.TYPE == KNIGHT:
-                    return True
-        return False
+                if end_piece.COLOR == self.COLOR:
+                    if pinned_piece is not None:  # Two friendly pieces in a row, nothing is pinned
+                        break
+                    pinned_piece = end_piece
+                elif end_piece.COLOR == opposite_color:
+                    is_slider = is_diagonal_piece(end_piece) if is_diagonal else is_cardinal_piece(end_piece)
+                    if pinned_piece is not None:
+                        if is_slider:
+                            pins[(pinned_piece.row, pinned_piece.column)] = ray_prefixes[num_squares_away - 1]
+                    elif is_slider or (is_diagonal
+                                       and in_range_of_pawn(end_piece, num_squares_away, self.row, self.column)):
+                        checks.append(ray_prefixes[num_squares_away - 1])
+                    break
+
+        for end_row, end_column in KNIGHT_TARGETS[self.row][self.column]:
+            end_piece = board[end_row][end_column]
+            if end_piece.COLOR == opposite_color and end_piece.TYPE == KNIGHT:
+                checks.append(SQUARE_SETS[end_row][end_column])
+
+        return checks, pins
 
     def is_two_squares_to_the_right(self, piece):
         return self.row == piece.row and self.column - piece.column == -2
@@ -306,7 +348,22 @@ class King(Piece):
 
 
 class Blank(Piece):
+    """
+    An empty square. There is one shared Blank per square, from get_blank(), and it never moves,
+    so emptying a square allocates nothing.
+    """
+    __slots__ = ()
     TYPE = 0
 
     def __init__(self, row=-1, column=-1):
         super().__init__(None, row, column)
+
+
+BLANKS = [[Blank(row, column) for column in range(8)] for row in range(8)]
+
+
+def get_blank(row, column):
+    return BLANKS[row][column]
+
+
+PIECE_TYPE_CLASSES = {PAWN: Pawn, KNIGHT: Knight, BISHOP: Bishop, ROOK: Rook, QUEEN: Queen, KING: King}
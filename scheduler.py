@@ -0,0 +1,63 @@
+import heapq
+import itertools
+import time
+
+
+class Timer:
+    def __init__(self, due_time, interval, callback):
+        self.due_time = due_time
+        self.interval = interval  # Seconds between calls of a repeating timer, None to call once
+        self.callback = callback
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+
+class Scheduler:
+    """
+    Timers for the game loop. The loop asks get_timeout() how long it may block waiting for input,
+    then calls run_due_timers() once it wakes up.
+    """
+
+    def __init__(self):
+        self.timers = []  # Heap of (due time, sequence number, Timer)
+        self.sequence = itertools.count()  # Breaks ties between timers due at the same time
+
+    def call_later(self, delay, callback):
+        """
+        Calls callback once, delay seconds from now.
+        :return: Timer, whose cancel() stops it from being called.
+        """
+        return self.add_timer(Timer(time.monotonic() + delay, None, callback))
+
+    def call_every(self, interval, callback):
+        """Calls callback every interval seconds, starting interval seconds from now."""
+        return self.add_timer(Timer(time.monotonic() + interval, interval, callback))
+
+    def add_timer(self, timer):
+        heapq.heappush(self.timers, (timer.due_time, next(self.sequence), timer))
+        return timer
+
+    def get_timeout(self):
+        """
+        Seconds until the next timer is due, 0 if one is overdue, None if there are no timers,
+        meaning the loop can block until input arrives.
+        """
+        while self.timers and self.timers[0][2].is_cancelled:
+            heapq.heappop(self.timers)
+        if not self.timers:
+            return None
+        return max(0.0, self.timers[0][0] - time.monotonic())
+
+    def run_due_timers(self):
+        now = time.monotonic()
+        while self.timers and self.timers[0][0] <= now:
+            _, _, timer = heapq.heappop(self.timers)
+            if timer.is_cancelled:
+                continue
+            timer.callback()
+            if timer.interval is not None and not timer.is_cancelled:
+                # Scheduled from the old due time so the rate doesn't drift, skipping calls missed while busy
+                timer.due_time = max(timer.due_time + timer.interval, now)
+                self.add_timer(timer)
@@ -0,0 +1,272 @@
+"""
+Finds the best move in a GameEngine position.
+
+Iterative deepening runs a negamax alpha-beta search one ply deeper each iteration, until a depth,
+node or time limit is reached. Each iteration reports its depth, score, node count, nodes per second
+and principal variation. The result of the last finished iteration is returned.
+
+Usage:
+    python search.py --depth 4
+    python search.py --fen "<fen>" --time 10 --hash 64
+"""
+import argparse
+import sys
+import time
+
+from constants import *
+from fen import START_FEN
+from move import Move
+from model import GameEngine
+from move_ordering import MoveOrderer
+from perft import new_engine
+from transposition_table import EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE, TranspositionTable
+
+MATE_SCORE = 100000
+MAX_PLY = 128
+CHECK_LIMITS_EVERY = 256  # Nodes between time and stop checks
+
+
+class SearchAborted(Exception):
+    """Raised inside the tree when a limit is hit, to unwind an unfinished iteration."""
+
+
+class SearchInfo:
+    """
+    Progress after one iteration of iterative deepening.
+    """
+
+    def __init__(self, depth, score, nodes, elapsed, pv):
+        self.depth = depth
+        self.score = score
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv
+
+    def get_nodes_per_second(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def get_score_string(self):
+        if abs(self.score) >= MATE_SCORE - MAX_PLY:
+            moves_to_mate = (MATE_SCORE - abs(self.score) + 1) // 2
+            return f'mate {moves_to_mate if self.score > 0 else -moves_to_mate}'
+        return f'cp {self.score}'
+
+    def __str__(self):
+        return (f'depth {self.depth} score {self.get_score_string()} nodes {self.nodes} '
+                f'nps {self.get_nodes_per_second()} time {int(self.elapsed * 1000)} '
+                f'pv {" ".join(str(move) for move in self.pv)}')
+
+
+class SearchResult:
+    def __init__(self, best_move, score, depth, nodes, elapsed, pv):
+        self.best_move = best_move  # None if the side to move has no legal moves
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.pv = pv
+
+
+def score_to_table(score, ply):
+    """Mate scores are stored as distance from the stored position rather than from the root."""
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+
+class Searcher:
+    """
+    Searches the position of a GameEngine in place with make_move/unmake_move.
+    The engine is back in its starting position when search() returns.
+    """
+
+    def __init__(self, engine, table=None, evaluate=GameEngine.get_evaluation, orderer=None):
+        """
+        :param engine: the GameEngine to search.
+        :param table: optional TranspositionTable shared between searches.
+        :param evaluate: leaf evaluation, called with the engine, scoring for the side to move.
+        :param orderer: MoveOrderer whose killers and history are kept between searches, a new one by default.
+        """
+        self.engine = engine
+        self.table = table
+        self.evaluate = evaluate
+        self.orderer = orderer if orderer is not None else MoveOrderer()
+
+        self.nodes = 0
+        self.max_nodes = None
+        self.deadline = None
+        self.stop_requested = False
+        self.root_best_move = None
+
+    def stop(self):
+        """
+        Asks a running search to return as soon as possible. Safe to call from another thread,
+        also just before search() is called, which then returns after its first limit check.
+        """
+        self.stop_requested = True
+
+    def search(self, max_depth=None, max_nodes=None, max_time=None, on_iteration=None):
+        """
+        Iterative deepening search within the given limits. With no limits at all, searches to depth 4.
+
+        :param max_depth: deepest iteration to run.
+        :param max_nodes: node budget for the whole search.
+        :param max_time: seconds to search for.
+        :param on_iteration: called with a SearchInfo after each finished iteration.
+        :return: SearchResult of the deepest finished iteration.
+        """
+        if max_depth is None and max_nodes is None and max_time is None:
+            max_depth = 4
+        start_time = time.perf_counter()
+        self.nodes = 0
+        self.max_nodes = max_nodes
+        self.deadline = start_time + max_time if max_time is not None else None
+        self.root_best_move = None
+
+        legal_moves = self.engine.generate_ordered_moves(self.engine.color_to_move)
+        if not legal_moves:
+            self.stop_requested = False
+            score = -MATE_SCORE if self.engine.is_in_check(self.engine.color_to_move) else 0
+            return SearchResult(None, score, 0, 0, 0.0, [])
+        # Stopped before the first iteration finishes, the best capture is played
+        result = SearchResult(legal_moves[0], 0, 0, 0, 0.0, [legal_moves[0]])
+
+        depth = 1
+        while max_depth is None or depth <= max_depth:
+            pv = []
+            try:
+                score = self.negamax(depth, -INFINITY, INFINITY, 0, pv)
+            except SearchAborted:
+                break
+            elapsed = time.perf_counter() - start_time
+            self.root_best_move = pv[0]
+            result = SearchResult(pv[0], score, depth, self.nodes, elapsed, pv)
+            if on_iteration is not None:
+                on_iteration(SearchInfo(depth, score, self.nodes, elapsed, pv))
+
+            if abs(score) >= MATE_SCORE - MAX_PLY or depth >= MAX_PLY:
+                break  # A forced mate won't change with more depth
+            if self.deadline is not None and time.perf_counter() - start_time > max_time / 2:
+                break  # The next iteration would most likely not finish in time
+            depth += 1
+
+        self.stop_requested = False
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start_time
+        return result
+
+    def check_limits(self):
+        if (self.stop_requested
+                or (self.max_nodes is not None and self.nodes >= self.max_nodes)
+                or (self.deadline is not None and time.perf_counter() >= self.deadline)):
+            raise SearchAborted()
+
+    def evaluate_node(self, engine):
+        """Static evaluation of a quiescence node, which resolve_captures() calls once per node it visits."""
+        self.nodes += 1
+        return self.evaluate(engine)
+
+    def negamax(self, depth, alpha, beta, ply, pv):
+        """
+        Score of the position for the side to move, searched depth plies deep.
+        The moves of the principal variation found are written into pv.
+        """
+        engine = self.engine
+        if depth == 0:
+            return engine.resolve_captures(alpha, beta, self.evaluate_node)
+
+        self.nodes += 1
+        if self.nodes % CHECK_LIMITS_EVERY == 0:
+            self.check_limits()
+
+        original_alpha = alpha
+        hash_move = NO_MOVE
+        if self.table is not None:
+            entry = self.table.probe(engine.zobrist_key)
+            if entry is not None:
+                entry_depth, entry_score, bound, hash_move = entry
+                if ply > 0 and entry_depth >= depth:
+                    score = score_from_table(entry_score, ply)
+                    if (bound == EXACT
+                            or (bound == LOWER_BOUND and score >= beta)
+                            or (bound == UPPER_BOUND and score <= alpha)):
+                        return score
+
+        color = engine.color_to_move
+        hint_moves = (self.root_best_move if ply == 0 else None,
+                      Move.from_int(hash_move) if hash_move != NO_MOVE else None)
+        moves = engine.generate_ordered_moves(color, hint_moves, self.orderer, ply)
+        if not moves:
+            return -MATE_SCORE + ply if engine.is_in_check(color) else 0
+
+        best_score = -INFINITY
+        best_move = None
+        best_move_index = None
+        for index, move in enumerate(moves):
+            child_pv = []
+            engine.make_move(move)
+            try:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1, child_pv)
+            finally:
+                engine.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    best_move_index = index
+                    pv[:] = [move] + child_pv
+                    if alpha >= beta:
+                        self.orderer.record_cutoff(engine.board, move, color, ply, depth)
+                        break
+        if best_move_index is not None:
+            self.orderer.record_best_move(best_move_index)
+
+        if self.table is not None:
+            if best_score <= original_alpha:
+                bound = UPPER_BOUND
+            elif best_score >= beta:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            self.table.store(engine.zobrist_key, depth, score_to_table(best_score, ply), bound, best_move.to_int())
+        return best_score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Search a chess position for the best move.')
+    parser.add_argument('--fen', default=START_FEN, help='position to search, defaults to the start position')
+    parser.add_argument('--depth', type=int, help='deepest iteration to search')
+    parser.add_argument('--nodes', type=int, help='node budget')
+    parser.add_argument('--time', type=float, help='seconds to search')
+    parser.add_argument('--hash', type=float, default=16, help='MB of transposition table, 0 for none (default: 16)')
+    parser.add_argument('--backend', choices=BACKENDS, default=OBJECT_BACKEND,
+                        help='board representation to generate moves with')
+    parser.add_argument('--debug', action='store_true',
+                        help='check the incremental evaluation against a full recompute at every leaf')
+    args = parser.parse_args(argv)
+
+    engine = new_engine(args.fen, args.backend, args.debug)
+    table = TranspositionTable(args.hash) if args.hash else None
+    searcher = Searcher(engine, table)
+    result = searcher.search(args.depth, args.nodes, args.time, on_iteration=print)
+    print(f'bestmove {result.best_move}')
+    print(f'Ordering: {searcher.orderer}')
+    if table is not None:
+        print(f'Hash: {table}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
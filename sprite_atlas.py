@@ -0,0 +1,141 @@
+"""
+Piece images rasterized once per square size into a single atlas cached on disk.
+
+Loading and scaling the 12 SVG files takes most of the GUI start up, so the scaled pieces are drawn into one
+surface, a column per piece type and a row per color, and its raw RGBA bytes saved to ATLAS_DIRECTORY.
+The file name holds the square size and a checksum of the SVG modification times, so editing a piece image
+or asking for another size rasterizes a new atlas, and later starts read the atlas back in one go.
+
+Usage:
+    python sprite_atlas.py --sizes 100 80
+    python sprite_atlas.py --benchmark
+"""
+import argparse
+import os
+import sys
+import time
+import zlib
+
+import pygame
+
+from constants import *
+
+IMAGE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+ATLAS_DIRECTORY = os.path.join(IMAGE_DIRECTORY, 'cache')
+ATLAS_PIECE_TYPES = [PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING]  # Columns of the atlas, rows are indexed by color
+
+
+def get_image_path(piece, color):
+    return os.path.join(IMAGE_DIRECTORY, f'{PIECE_NAMES[piece]}-{COLOR_NAMES[color]}.svg')
+
+
+def get_atlas_path(square_size):
+    """Cache file of the atlas for square_size, named after the current versions of the SVG files."""
+    source_key = 0
+    for piece in ATLAS_PIECE_TYPES:
+        for color in COLORS:
+            image_path = get_image_path(piece, color)
+            source_key = zlib.crc32(f'{os.path.basename(image_path)}:{os.stat(image_path).st_mtime_ns};'.encode(),
+                                    source_key)
+    return os.path.join(ATLAS_DIRECTORY, f'pieces-{square_size}px-{source_key:08x}.rgba')
+
+
+def get_atlas_size(square_size):
+    return len(ATLAS_PIECE_TYPES) * square_size, len(COLORS) * square_size
+
+
+def rasterize_atlas(square_size):
+    """Loads and scales every SVG, the slow path the cache avoids."""
+    atlas = pygame.Surface(get_atlas_size(square_size), pygame.SRCALPHA)
+    for column, piece in enumerate(ATLAS_PIECE_TYPES):
+        for color in COLORS:
+            image = pygame.transform.scale(pygame.image.load(get_image_path(piece, color)), (square_size, square_size))
+            atlas.blit(image, (column * square_size, int(color) * square_size))
+    return atlas
+
+
+def build_atlas(square_size):
+    """
+    Rasterizes the atlas for square_size and saves it, removing atlases of older SVG files of the same size.
+    The atlas is still returned if the cache directory can't be written.
+    """
+    atlas = rasterize_atlas(square_size)
+    atlas_path = get_atlas_path(square_size)
+    try:
+        os.makedirs(ATLAS_DIRECTORY, exist_ok=True)
+        for file_name in os.listdir(ATLAS_DIRECTORY):
+            if file_name.startswith(f'pieces-{square_size}px-'):
+                os.remove(os.path.join(ATLAS_DIRECTORY, file_name))
+        # Written under another name first, so a concurrent start never reads half a file
+        temporary_path = f'{atlas_path}.{os.getpid()}'
+        with open(temporary_path, 'wb') as atlas_file:
+            atlas_file.write(pygame.image.tobytes(atlas, 'RGBA'))
+        os.replace(temporary_path, atlas_path)
+    except OSError:
+        pass
+    return atlas
+
+
+def load_atlas(square_size):
+    """The atlas for square_size, read from the cache, or rasterized and cached if it isn't there."""
+    try:
+        with open(get_atlas_path(square_size), 'rb') as atlas_file:
+            data = atlas_file.read()
+    except OSError:
+        return build_atlas(square_size)
+    width, height = get_atlas_size(square_size)
+    if len(data) != 4 * width * height:
+        return build_atlas(square_size)
+    return pygame.image.frombytes(data, (width, height), 'RGBA')
+
+
+def load_piece_images(square_size):
+    """
+    Piece images as subsurfaces of the atlas for square_size.
+    :return: [{piece type: Surface} for black, {piece type: Surface} for white]
+    """
+    atlas = load_atlas(square_size)
+    if pygame.display.get_surface() is not None:
+        atlas = atlas.convert_alpha()  # Match the display pixel format so blits don't convert every frame
+    images = [{}, {}]
+    for column, piece in enumerate(ATLAS_PIECE_TYPES):
+        for color in COLORS:
+            images[color][piece] = atlas.subsurface(
+                pygame.Rect(column * square_size, int(color) * square_size, square_size, square_size))
+    return images
+
+
+def benchmark(square_size, repeat=10):
+    """:return: (mean seconds to rasterize the SVG files, mean seconds to load the cached atlas)"""
+    build_atlas(square_size)
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        rasterize_atlas(square_size)
+    rasterize_time = (time.perf_counter() - start_time) / repeat
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        load_piece_images(square_size)
+    load_time = (time.perf_counter() - start_time) / repeat
+    return rasterize_time, load_time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rasterize the piece images into cached atlases.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100], help='square sizes in pixels to build')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='compare rasterizing the SVG files against loading the cached atlas')
+    args = parser.parse_args(argv)
+
+    for square_size in args.sizes:
+        if args.benchmark:
+            rasterize_time, load_time = benchmark(square_size)
+            print(f'{square_size}px: SVG {rasterize_time * 1000:.2f} ms, atlas {load_time * 1000:.2f} ms '
+                  f'({rasterize_time / load_time:.1f}x)')
+        else:
+            build_atlas(square_size)
+            print(get_atlas_path(square_size))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
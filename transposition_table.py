@@ -0,0 +1,253 @@
+"""
+Fixed size hash table of search results, keyed by GameEngine.zobrist_key.
+
+Entries live in preallocated parallel arrays instead of a dict of objects, so the table costs
+ENTRY_SIZE bytes per entry no matter how full it is. Each key maps to a bucket of two slots: the first
+keeps the deepest result seen for the bucket, the second is always replaced, so deep results survive
+while recent shallow ones still get stored.
+"""
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+
+# Bound types. EMPTY marks a free slot.
+EMPTY, EXACT, LOWER_BOUND, UPPER_BOUND = range(4)
+
+NO_MOVE = 0
+BUCKET_SIZE = 2
+ENTRY_SIZE = 8 + 8 + 1 + 1 + 2  # key, score, depth, bound, best move in bytes
+SHARED_ENTRY_SIZE = 8 + 8  # key check, packed data
+SCORE_OFFSET = 1 << 31  # Scores are stored unsigned in the packed data
+DEPTH_OFFSET = 1 << 7
+
+
+def get_num_buckets(size_mb, entry_size):
+    """The most buckets that fit in size_mb, rounded down to a power of two."""
+    max_buckets = max(1, int(size_mb * 1024 * 1024) // (entry_size * BUCKET_SIZE))
+    return 1 << (max_buckets.bit_length() - 1)
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        """
+        size_mb: memory budget. The number of buckets is rounded down to a power of two.
+        """
+        num_buckets = get_num_buckets(size_mb, ENTRY_SIZE)
+        self.bucket_mask = num_buckets - 1
+        self.num_entries = num_buckets * BUCKET_SIZE
+
+        self.keys = array('Q', bytes(8 * self.num_entries))
+        self.scores = array('q', bytes(8 * self.num_entries))
+        self.depths = array('b', bytes(self.num_entries))
+        self.bounds = array('B', bytes(self.num_entries))
+        self.best_moves = array('H', bytes(2 * self.num_entries))  # Move.to_int() values
+
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0  # Misses where the bucket held other positions
+        self.stores = 0
+        self.overwrites = 0  # Stores that evicted a different position
+
+    def get_slot(self, key):
+        """Index of the entry for key, or -1."""
+        slot = (key & self.bucket_mask) * BUCKET_SIZE
+        keys = self.keys
+        bounds = self.bounds
+        if keys[slot] == key and bounds[slot] != EMPTY:
+            return slot
+        if keys[slot + 1] == key and bounds[slot + 1] != EMPTY:
+            return slot + 1
+        return -1
+
+    def probe(self, key):
+        """
+        Returns (depth, score, bound, best_move) stored for key, or None.
+        """
+        slot = self.get_slot(key)
+        if slot < 0:
+            self.misses += 1
+            first_slot = (key & self.bucket_mask) * BUCKET_SIZE
+            if self.bounds[first_slot] != EMPTY or self.bounds[first_slot + 1] != EMPTY:
+                self.collisions += 1
+            return None
+        self.hits += 1
+        return self.depths[slot], self.scores[slot], self.bounds[slot], self.best_moves[slot]
+
+    def store(self, key, depth, score, bound, best_move=NO_MOVE):
+        first_slot = (key & self.bucket_mask) * BUCKET_SIZE
+        bounds = self.bounds
+        if (bounds[first_slot] == EMPTY or self.keys[first_slot] == key
+                or depth >= self.depths[first_slot]):
+            slot = first_slot  # Depth-preferred slot
+            if self.keys[first_slot + 1] == key:
+                bounds[first_slot + 1] = EMPTY  # Don't keep a stale copy in the other slot
+        else:
+            slot = first_slot + 1  # Always-replace slot
+
+        if bounds[slot] != EMPTY and self.keys[slot] != key:
+            self.overwrites += 1
+        if best_move == NO_MOVE and self.keys[slot] == key and bounds[slot] != EMPTY:
+            best_move = self.best_moves[slot]  # Keep the move found by an earlier search of this position
+
+        self.keys[slot] = key
+        self.scores[slot] = score
+        self.depths[slot] = depth
+        bounds[slot] = bound
+        self.best_moves[slot] = best_move
+        self.stores += 1
+
+    def get_best_move(self, key):
+        slot = self.get_slot(key)
+        return self.best_moves[slot] if slot >= 0 else NO_MOVE
+
+    def clear(self):
+        self.bounds = array('B', bytes(self.num_entries))
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.hits = self.misses = self.collisions = self.stores = self.overwrites = 0
+
+    def get_size_bytes(self):
+        return self.num_entries * ENTRY_SIZE
+
+    def get_fill_permille(self, sample_size=1000):
+        """Used entries per thousand among the first sample_size entries."""
+        sample = self.bounds[:min(sample_size, self.num_entries)]
+        return 1000 * sum(1 for bound in sample if bound != EMPTY) // len(sample)
+
+    def get_stats(self):
+        probes = self.hits + self.misses
+        return {
+            'entries': self.num_entries,
+            'size_mb': self.get_size_bytes() / (1024 * 1024),
+            'hits': self.hits,
+            'misses': self.misses,
+            'collisions': self.collisions,
+            'hit_rate': self.hits / probes if probes else 0.0,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'fill_permille': self.get_fill_permille(),
+        }
+
+    def __str__(self):
+        stats = self.get_stats()
+        return (f"{stats['entries']} entries ({stats['size_mb']:.1f} MB), "
+                f"{stats['hits']} hits, {stats['misses']} misses ({stats['collisions']} collisions), "
+                f"hit rate {stats['hit_rate']:.1%}, {stats['stores']} stores, {stats['overwrites']} overwrites, "
+                f"{stats['fill_permille'] / 10:.1f}% full")
+
+
+def pack_entry(depth, score, bound, best_move):
+    """Packs an entry into 64 bits: score | depth << 32 | bound << 40 | best move << 48."""
+    return (score + SCORE_OFFSET) | (depth + DEPTH_OFFSET) << 32 | bound << 40 | best_move << 48
+
+
+def unpack_entry(data):
+    """Returns (depth, score, bound, best_move) packed by pack_entry()."""
+    return (((data >> 32) & 0xFF) - DEPTH_OFFSET, (data & 0xFFFFFFFF) - SCORE_OFFSET,
+            (data >> 40) & 0xFF, data >> 48)
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    TranspositionTable in a multiprocessing.shared_memory block that several processes probe and store into.
+
+    Processes write without locking. Each slot holds its packed data and the key XORed with that data,
+    so a slot torn by two processes storing at once fails the key check instead of returning mixed data.
+    The hit and store counters count for the current process only.
+    """
+
+    def __init__(self, size_mb=16, name=None):
+        """
+        size_mb: memory budget, must be the same in every process sharing the table.
+        name: name of the block to attach to, made by another process. None creates a new block,
+              which this process unlinks in close().
+        """
+        num_buckets = get_num_buckets(size_mb, SHARED_ENTRY_SIZE)
+        self.size_mb = size_mb
+        self.bucket_mask = num_buckets - 1
+        self.num_entries = num_buckets * BUCKET_SIZE
+
+        self.is_owner = name is None
+        if self.is_owner:
+            self.shared_memory = SharedMemory(create=True, size=self.get_size_bytes())
+            self.shared_memory.buf[:self.get_size_bytes()] = bytes(self.get_size_bytes())
+        else:
+            self.shared_memory = SharedMemory(name=name)
+        self.name = self.shared_memory.name
+        self.checks = self.shared_memory.buf[:8 * self.num_entries].cast('Q')
+        self.data = self.shared_memory.buf[8 * self.num_entries:self.get_size_bytes()].cast('Q')
+
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def get_slot(self, key):
+        slot = (key & self.bucket_mask) * BUCKET_SIZE
+        checks = self.checks
+        data = self.data
+        if data[slot] and checks[slot] ^ data[slot] == key:
+            return slot
+        if data[slot + 1] and checks[slot + 1] ^ data[slot + 1] == key:
+            return slot + 1
+        return -1
+
+    def probe(self, key):
+        slot = self.get_slot(key)
+        if slot < 0:
+            self.misses += 1
+            first_slot = (key & self.bucket_mask) * BUCKET_SIZE
+            if self.data[first_slot] or self.data[first_slot + 1]:
+                self.collisions += 1
+            return None
+        self.hits += 1
+        return unpack_entry(self.data[slot])
+
+    def store(self, key, depth, score, bound, best_move=NO_MOVE):
+        first_slot = (key & self.bucket_mask) * BUCKET_SIZE
+        checks = self.checks
+        data = self.data
+        first_data = data[first_slot]
+        if not first_data or checks[first_slot] ^ first_data == key or depth >= unpack_entry(first_data)[0]:
+            slot = first_slot  # Depth-preferred slot
+            if data[first_slot + 1] and checks[first_slot + 1] ^ data[first_slot + 1] == key:
+                data[first_slot + 1] = 0  # Don't keep a stale copy in the other slot
+        else:
+            slot = first_slot + 1  # Always-replace slot
+
+        old_data = data[slot]
+        is_same_position = old_data and checks[slot] ^ old_data == key
+        if old_data and not is_same_position:
+            self.overwrites += 1
+        if best_move == NO_MOVE and is_same_position:
+            best_move = unpack_entry(old_data)[3]  # Keep the move found by an earlier search of this position
+
+        new_data = pack_entry(depth, score, bound, best_move)
+        checks[slot] = key ^ new_data
+        data[slot] = new_data
+        self.stores += 1
+
+    def get_best_move(self, key):
+        slot = self.get_slot(key)
+        return unpack_entry(self.data[slot])[3] if slot >= 0 else NO_MOVE
+
+    def clear(self):
+        """Empties the table for every process sharing it."""
+        self.shared_memory.buf[:self.get_size_bytes()] = bytes(self.get_size_bytes())
+        self.reset_counters()
+
+    def close(self):
+        """Detaches this process from the table. The creating process also frees it."""
+        self.checks.release()
+        self.data.release()
+        self.shared_memory.close()
+        if self.is_owner:
+            self.shared_memory.unlink()
+
+    def get_size_bytes(self):
+        return self.num_entries * SHARED_ENTRY_SIZE
+
+    def get_fill_permille(self, sample_size=1000):
+        sample = self.data[:min(sample_size, self.num_entries)]
+        return 1000 * sum(1 for data in sample if data) // len(sample)
@@ -0,0 +1,142 @@
+"""
+Checks every move of the games in a PGN file against the rules, in several processes at once.
+
+The parent streams the games from the file and deals them out in chunks to a ProcessPoolExecutor.
+Each worker replays its chunk on one GameEngine it keeps for all its chunks and sends back a line per game.
+Only a few chunks per worker are in flight at a time, so memory stays bounded however large the file is,
+and the results are written in the order of the games in the file.
+
+Each output line holds, separated by tabs: the game number, legal or illegal, the ply of the first
+illegal move (0 if there is none), the position after the last legal move as FEN, and the error if any.
+A game whose FEN tag can't be loaded is illegal at ply 0, with the tag's FEN and a "bad FEN" error.
+
+Usage:
+    python validate_games.py games.pgn --output results.tsv
+    python validate_games.py games.pgn --workers 8 --chunk-size 500
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import *
+from fen import START_FEN, load_fen, to_fen
+from model import GameEngine
+from pgn import parse_san, read_games
+
+CHUNKS_PER_WORKER = 4  # Chunks submitted ahead for each worker, bounding the games held in memory
+
+_worker_engine = None  # The GameEngine a worker process replays every game on, made by make_engine()
+
+
+def make_engine(backend):
+    """Worker initializer."""
+    global _worker_engine
+    _worker_engine = GameEngine.from_fen(START_FEN, backend=backend)
+
+
+def validate_game(engine, game):
+    """
+    Any error replaying a game is reported as that game's failure, so one bad game can't end the run.
+    A game whose FEN tag can't be loaded is reported at ply 0 with the tag's FEN, since engine is left
+    half set up and the next game loads its own position anyway.
+
+    :return: (is legal, ply of the first illegal move or 0, FEN after the last legal move, error or '')
+    """
+    start_fen = game.get_start_fen()
+    try:
+        load_fen(engine, start_fen)
+    except Exception as error:
+        return False, 0, start_fen, f'bad FEN: {error}'
+    for ply, san in enumerate(game.sans, 1):
+        try:
+            engine.play_move(parse_san(engine, san))
+        except Exception as error:
+            return False, ply, to_fen(engine), str(error) or type(error).__name__
+    return True, 0, to_fen(engine), ''
+
+
+def validate_chunk(first_game_number, games):
+    """Validates a chunk of games in a worker process, returning an output line for each."""
+    lines = []
+    for game_number, game in enumerate(games, first_game_number):
+        is_legal, illegal_ply, fen, error = validate_game(_worker_engine, game)
+        lines.append(f'{game_number}\t{"legal" if is_legal else "illegal"}\t{illegal_ply}\t{fen}\t{error}\n')
+    return lines
+
+
+def get_chunks(games, chunk_size):
+    """Yields (number of the first game, list of at most chunk_size games) for the games of an iterable."""
+    games = iter(games)
+    first_game_number = 1
+    while True:
+        chunk = list(itertools.islice(games, chunk_size))
+        if not chunk:
+            return
+        yield first_game_number, chunk
+        first_game_number += len(chunk)
+
+
+def validate_games(lines, out, num_workers, chunk_size=200, backend=OBJECT_BACKEND, progress=None):
+    """
+    Validates the games of a PGN file, writing a line per game to out in file order.
+
+    :param lines: the PGN file, or any iterable of its lines.
+    :param progress: called with (games done, illegal games) after each chunk is written, or None.
+    :return: (games, illegal games)
+    """
+    num_games = num_illegal = 0
+    chunks = get_chunks(read_games(lines), chunk_size)
+    with ProcessPoolExecutor(num_workers, initializer=make_engine, initargs=(backend,)) as executor:
+        pending = deque()
+        for first_game_number, chunk in itertools.islice(chunks, num_workers * CHUNKS_PER_WORKER):
+            pending.append(executor.submit(validate_chunk, first_game_number, chunk))
+        while pending:
+            chunk_lines = pending.popleft().result()  # The oldest chunk, so the output stays in order
+            next_chunk = next(chunks, None)
+            if next_chunk is not None:
+                pending.append(executor.submit(validate_chunk, *next_chunk))
+            out.writelines(chunk_lines)
+            num_games += len(chunk_lines)
+            num_illegal += sum(1 for line in chunk_lines if '\tillegal\t' in line)
+            if progress is not None:
+                progress(num_games, num_illegal)
+    return num_games, num_illegal
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the moves of every game in a PGN file, in parallel.')
+    parser.add_argument('path', help='PGN file to validate')
+    parser.add_argument('--output', default='-', help='file to write a line per game to, - for stdout')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes to validate with')
+    parser.add_argument('--chunk-size', type=int, default=200, help='games sent to a worker at a time')
+    parser.add_argument('--backend', choices=BACKENDS, default=OBJECT_BACKEND,
+                        help='board representation to generate moves with')
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+
+    def print_progress(num_games, num_illegal):
+        elapsed = time.perf_counter() - start_time
+        print(f'\r{num_games} games, {num_illegal} illegal, {num_games / elapsed:.1f} games/s',
+              end='', file=sys.stderr, flush=True)
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        with open(args.path) as lines:
+            num_games, num_illegal = validate_games(lines, out, args.workers, args.chunk_size, args.backend,
+                                                    print_progress)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start_time
+    print(f'\n{num_games} games, {num_illegal} illegal in {elapsed:.2f}s with {args.workers} workers '
+          f'({num_games / elapsed:.1f} games/s)', file=sys.stderr)
+    return 1 if num_illegal else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
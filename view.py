@@ -1,7 +1,10 @@
+import time
+
 import pygame
 import model
 from eventmanager import *
 from constants import *
+from sprite_atlas import load_piece_images
 
 WIDTH = HEIGHT = 800
 DIMENSION = 8
@@ -18,6 +21,7 @@ HIGHLIGHTED_BLACK_COLOR = (53, 139, 203)
 LEGAL_MOVE_WHITE_COLOR = (210, 209, 188)
 LEGAL_MOVE_BLACK_COLOR = (67, 103, 138)
 COLOR_SHADES = [WHITE_COLOR, BLACK_COLOR]
+NO_MARKER, MOVE_MARKER, CAPTURE_MARKER = range(3)  # Legal move markers on a square
 HIGHLIGHTED_COLOR_SHADES = [HIGHLIGHTED_WHITE_COLOR, HIGHLIGHTED_BLACK_COLOR]
 LEGAL_MOVE_SHADES = [LEGAL_MOVE_WHITE_COLOR, LEGAL_MOVE_BLACK_COLOR]
 
@@ -38,15 +42,12 @@ def piece_name_to_type(piece_name: str) -> PieceType:
     return PIECE_NAMES.index(piece_name)
 
 
+def get_square_rect(row, column):
+    return pygame.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+
 def load_images():
-    for piece in PIECE_TYPES:
-        if piece == BLANK:
-            continue
-        for color in COLORS:
-            IMAGES[color][piece] = pygame.transform.scale(
-                pygame.image.load(f'images/{piece_type_to_name(piece)}-{color_type_to_name(color)}.svg'),
-                (SQUARE_SIZE, SQUARE_SIZE)
-            )
+    IMAGES[:] = load_piece_images(SQUARE_SIZE)
 
 
 class GraphicalView:
@@ -54,46 +55,81 @@ class GraphicalView:
     Draw the model state onto the screen.
     """
 
-    def __init__(self, event_manager, model):
+    def __init__(self, event_manager, model, show_frame_rate=False):
         """
         :param event_manager: Allows posting messages to the event queue.
         :param model: a strong reference to the game Model.
+        :param show_frame_rate: show the measured frames per second in the window caption, updated every second.
         """
 
         self.event_manager = event_manager
-        event_manager.register_listener(self)
+        event_manager.subscribe(InitializeEvent, self.on_initialize)
+        event_manager.subscribe(QuitEvent, self.on_quit)
+        event_manager.subscribe(InputEvent, self.on_input)
         self.model = model
+        self.show_frame_rate = show_frame_rate
         self.is_initialized = False
         self.screen = None
         self.clock = None
+        self.drawn_square_states = None  # get_square_states() of the last frame drawn
 
-    def notify(self, event):
-        """
-        Receive events posted to the message queue.
-        """
-        if isinstance(event, InitializeEvent):
-            self.initialize()
-        elif isinstance(event, QuitEvent):
-            # shut down the pygame graphics
-            self.is_initialized = False
-            pygame.quit()
-        elif isinstance(event, InputEvent):
-            self.render_all()
-            # limit the redraw speed to MAX_FPS frames per second
-            self.clock.tick(MAX_FPS)
-        # BEFORE WAS ON TICK EVENT
+    def on_initialize(self, event):
+        self.initialize()
+
+    def on_quit(self, event):
+        # shut down the pygame graphics
+        self.is_initialized = False
+        pygame.quit()
+
+    def on_input(self, event):
+        self.render_all()
+        # limit the redraw speed to MAX_FPS frames per second
+        self.clock.tick(MAX_FPS)
 
     def render_all(self):
         """
-        Draw the current game state on screen.
+        Draw the current game state on screen, redrawing only the squares that changed since the last frame.
         Does nothing if is_initialized == False (pygame.init failed).
         """
 
         if not self.is_initialized:
             return
-        self.draw_game_state()
-        # flip the display to show whatever we drew
+        square_states = self.get_square_states()
+        if self.drawn_square_states is None:
+            self.draw_squares(square_states)
+            # flip the display to show whatever we drew
+            pygame.display.flip()
+        else:
+            dirty_rects = []
+            for square, square_state in enumerate(square_states):
+                if square_state != self.drawn_square_states[square]:
+                    row, column = divmod(square, DIMENSION)
+                    self.draw_square(row, column, square_state)
+                    dirty_rects.append(get_square_rect(row, column))
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+        self.drawn_square_states = square_states
+
+    def render_full(self):
+        """
+        Draw every square and flip the whole display, as render_all() did before it tracked changed squares.
+        Kept to compare frame times against.
+        """
+
+        if not self.is_initialized:
+            return
+        square_states = self.get_square_states()
+        self.draw_squares(square_states)
         pygame.display.flip()
+        self.drawn_square_states = square_states
+
+    def get_frame_rate(self):
+        """Frames drawn per second, averaged over the last ten frames."""
+        return self.clock.get_fps() if self.clock is not None else 0.0
+
+    def update_caption(self):
+        if self.is_initialized:
+            pygame.display.set_caption(f'Chess - {self.get_frame_rate():.1f} fps')
 
     def initialize(self):
         """
@@ -103,12 +139,16 @@ class GraphicalView:
         result = pygame.init()
         pygame.display.set_caption('Chess')
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        # Mouse motion would wake the game loop from waiting for input on every pixel moved
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
         self.clock = pygame.time.Clock()
         self.is_initialized = True
+        if self.show_frame_rate:
+            self.model.scheduler.call_every(1.0, self.update_caption)
         load_images()
         self.draw_board()
-        self.draw_game_state()
-        pygame.display.flip()
+        self.drawn_square_states = None  # Draw every square on the first frame
+        self.render_all()
 
     def draw_board(self):
         """Draws the squares on the board"""
@@ -120,55 +160,102 @@ class GraphicalView:
                                  pygame.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
                                  )
 
-    def draw_game_state(self):
-        """Draws the pieces on the board from the current game state."""
+    def get_square_states(self):
+        """
+        What each square shows, as (piece type, piece color, is selected, legal move marker) by row * 8 + column.
+        Two frames look the same on a square exactly when its states are equal.
+        """
+        legal_moves = self.model.get_legal_moves() if self.model.selected_piece is not None else ()
+        square_states = []
         for row in self.model.board:
             for piece in row:
-                if piece.TYPE:
-                    if piece.is_selected:
-                        self.select_piece(piece.row, piece.column)
-                    else:
-                        self.deselect_piece(piece.row, piece.column)
-                    self.screen.blit(IMAGES[piece.COLOR][piece.TYPE],
-                                     (piece.column * SQUARE_SIZE, piece.row * SQUARE_SIZE))
-                else:
-                    color = COLOR_SHADES[(piece.row + piece.column) % 2]
-                    pygame.draw.rect(self.screen,
-                                     color,
-                                     pygame.Rect(piece.column * SQUARE_SIZE, piece.row * SQUARE_SIZE, SQUARE_SIZE,
-                                                 SQUARE_SIZE)
-                                     )
-        if self.model.selected_piece is not None:
-            self.show_legal_moves()
+                legal_move_marker = NO_MARKER
+                if (piece.row, piece.column) in legal_moves:
+                    legal_move_marker = CAPTURE_MARKER if piece.TYPE else MOVE_MARKER
+                square_states.append((piece.TYPE, piece.COLOR, piece.is_selected, legal_move_marker))
+        return square_states
+
+    def draw_game_state(self):
+        """Draws the pieces on the board from the current game state."""
+        self.draw_squares(self.get_square_states())
+
+    def draw_squares(self, square_states):
+        for square, square_state in enumerate(square_states):
+            row, column = divmod(square, DIMENSION)
+            self.draw_square(row, column, square_state)
+
+    def draw_square(self, row, column, square_state):
+        piece_type, piece_color, is_selected, legal_move_marker = square_state
+        if is_selected:
+            self.select_piece(row, column)
+        else:
+            self.deselect_piece(row, column)
+
+        color = LEGAL_MOVE_SHADES[(row + column) % 2]  # Light squares have even parity, dark have odd parity
+        center = (column * SQUARE_SIZE + SQUARE_SIZE // 2, row * SQUARE_SIZE + SQUARE_SIZE // 2)
+        if legal_move_marker == MOVE_MARKER:
+            pygame.draw.circle(self.screen, color, center=center, radius=15)
+        elif legal_move_marker == CAPTURE_MARKER:
+            pygame.draw.circle(self.screen, color, center=center, radius=SQUARE_SIZE // 2, width=8)
+        if piece_type:
+            self.screen.blit(IMAGES[piece_color][piece_type], (column * SQUARE_SIZE, row * SQUARE_SIZE))
 
     def select_piece(self, row, column):
         color = HIGHLIGHTED_COLOR_SHADES[(row + column) % 2]  # Light squares have even parity, dark have odd parity
-        pygame.draw.rect(self.screen,
-                         color,
-                         pygame.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
-                         )
+        pygame.draw.rect(self.screen, color, get_square_rect(row, column))
 
     def deselect_piece(self, row, column):
         color = COLOR_SHADES[(row + column) % 2]  # Light squares have even parity, dark have odd parity
-        pygame.draw.rect(self.screen,
-                         color,
-                         pygame.Rect(column * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
-                         )
-
-    def show_legal_moves(self):
-        legal_moves = self.model.get_legal_moves()
-        for move in legal_moves:
-            row, column = move
-            piece = self.model.board[row][column]
-            color = LEGAL_MOVE_SHADES[(row + column) % 2]  # Light squares have even parity, dark have odd parity
-            if self.model.board[row][column].TYPE == BLANK:
-                pygame.draw.circle(self.screen,
-                                   color,
-                                   center=(column * SQUARE_SIZE + 50, row * SQUARE_SIZE + 50), radius=15)
+        pygame.draw.rect(self.screen, color, get_square_rect(row, column))
+
+
+def benchmark(num_frames=200, seed=0):
+    """
+    Plays random moves without a window, drawing a frame after each piece selection and each move,
+    once redrawing only the changed squares and once redrawing everything.
+    :return: (mean seconds per changed squares frame, mean seconds per full frame)
+    """
+    import random
+    import controller
+
+    frame_times = []
+    for render in (GraphicalView.render_all, GraphicalView.render_full):
+        event_manager = EventManager()
+        game_model = model.GameEngine(event_manager)
+        keyboard = controller.Keyboard(event_manager, game_model)
+        graphics = GraphicalView(event_manager, game_model)
+        graphics.initialize()
+        rng = random.Random(seed)
+        elapsed = 0.0
+        for frame in range(num_frames):
+            if game_model.selected_piece is None:
+                moves = game_model.generate_legal_moves(game_model.color_to_move)
+                if not moves:
+                    game_model = model.GameEngine(event_manager)  # Game over, start another
+                    keyboard.model = graphics.model = game_model
+                    moves = game_model.generate_legal_moves(game_model.color_to_move)
+                move = rng.choice(moves)
+                keyboard.select_piece(game_model.board[move.start_row][move.start_column])
             else:
-                pygame.draw.circle(self.screen,
-                                   color,
-                                   center=(column * SQUARE_SIZE + 50, row * SQUARE_SIZE + 50), radius=50, width=8)
-                self.screen.blit(IMAGES[piece.COLOR][piece.TYPE],
-                                 (piece.column * SQUARE_SIZE, piece.row * SQUARE_SIZE))
+                keyboard.handle_turn(game_model.board[move.end_row][move.end_column])
+                keyboard.deselect_piece()  # Still selected if the GUI doesn't play this move
+            start_time = time.perf_counter()
+            render(graphics)
+            elapsed += time.perf_counter() - start_time
+        frame_times.append(elapsed / num_frames)
+        pygame.quit()
+    return tuple(frame_times)
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
 
+    parser = argparse.ArgumentParser(description='Time drawing frames without a window.')
+    parser.add_argument('--frames', type=int, default=200, help='frames to draw with each renderer')
+    args = parser.parse_args()
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    dirty_frame_time, full_frame_time = benchmark(args.frames)
+    print(f'Changed squares: {dirty_frame_time * 1000:.3f} ms/frame')
+    print(f'Full redraw:     {full_frame_time * 1000:.3f} ms/frame')
+    print(f'Speedup: {full_frame_time / dirty_frame_time:.1f}x')
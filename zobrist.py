@@ -0,0 +1,59 @@
+"""
+Zobrist keys for hashing positions.
+
+A position's hash is the XOR of one random 64 bit key per piece on its square, plus keys for black to move,
+each castling right still held and the file of a pending en passant capture. GameEngine keeps its hash up
+to date by XORing keys in and out as pieces and rights change, instead of rehashing the board.
+"""
+import random
+
+from constants import *
+
+# Fixed seed so hashes are the same in every process and can be stored
+_random = random.Random(20240101)
+
+PIECE_KEYS = [[[[_random.getrandbits(64) for _ in range(8)] for _ in range(8)] for _ in PIECE_TYPES]
+              for _ in COLORS]  # [color][piece type][row][column]
+BLACK_TO_MOVE_KEY = _random.getrandbits(64)
+CASTLING_KEYS = [_random.getrandbits(64) for _ in range(4)]  # White kingside, white queenside, black kingside, black queenside
+EN_PASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]  # By file
+
+
+def get_piece_key(piece):
+    return PIECE_KEYS[piece.COLOR][piece.TYPE][piece.row][piece.column]
+
+
+def get_castling_key(white_castling_rights, black_castling_rights):
+    key = 0
+    for index, can_castle in enumerate((white_castling_rights.can_castle_kingside,
+                                        white_castling_rights.can_castle_queenside,
+                                        black_castling_rights.can_castle_kingside,
+                                        black_castling_rights.can_castle_queenside)):
+        if can_castle:
+            key ^= CASTLING_KEYS[index]
+    return key
+
+
+def get_en_passant_key(engine):
+    key = 0
+    if engine.en_passant_possible_white:
+        key ^= EN_PASSANT_KEYS[engine.en_passant_move_white[1]]
+    if engine.en_passant_possible_black:
+        key ^= EN_PASSANT_KEYS[engine.en_passant_move_black[1]]
+    return key
+
+
+def compute_hash(engine):
+    """
+    Hashes the position of engine from scratch.
+    """
+    key = 0
+    for row in engine.board:
+        for piece in row:
+            if piece.TYPE != BLANK:
+                key ^= get_piece_key(piece)
+    if engine.color_to_move == BLACK:
+        key ^= BLACK_TO_MOVE_KEY
+    key ^= get_castling_key(engine.white_castling_rights, engine.black_castling_rights)
+    key ^= get_en_passant_key(engine)
+    return key